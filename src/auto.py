@@ -0,0 +1,162 @@
+import argparse
+import csv
+import os
+import socket
+import subprocess
+import sys
+from pathlib import Path
+import Pyro5.api
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.utils.matrix_io import FORMATOS, forma_matriz, localizar_matriz
+from src.utils.modelo_custo import (ModeloCusto, REDE_PADRAO_MB_S, gflops_com_threads, ler_capacidades,
+                                    ler_historico, registrar_previsao)
+from distributed_client import medir_banda
+
+# Modo automático: prevê o tempo de cada modo (linear, paralelo local com w workers,
+# distribuído com k backends) para as matrizes pedidas com o modelo de custo de
+# utils.modelo_custo, roda o mais rápido e registra previsto x real em
+# <outdir>/auto_previsoes.csv. As execuções anteriores no run_logs.csv corrigem o
+# modelo, então as previsões melhoram conforme o modo é usado.
+
+DIRETORIO = Path(__file__).resolve().parent
+SCRIPTS = {"linear": "linear.py", "paralelo_local": "parallel_local.py", "distribuido": "distributed_client.py"}
+
+def candidatos_workers(maximo):
+    # 1, 2, 4, ... até o número de núcleos, incluindo ele
+    contagens, w = [], 1
+    while w < maximo:
+        contagens.append(w)
+        w *= 2
+    return contagens + [maximo]
+
+def capacidades_backends(uris, benchmarks, cap_local):
+    # GFLOPS de cada backend pelo benchmarks.csv do seu host (o maior GEMM com threads
+    # medido, senão o GEMM de 1 núcleo). Backends no mesmo host dividem os núcleos.
+    hosts = []
+    for uri in uris:
+        with Pyro5.api.Proxy(uri) as p:
+            hosts.append(p.get_host())
+    gflops = []
+    for host in hosts:
+        cap = cap_local if host == socket.gethostname() else ler_capacidades(benchmarks, host)
+        total = max(cap["gflops_threads"].values(), default=cap["gflops_nucleo"])
+        gflops.append(total / hosts.count(host))
+    with Pyro5.api.Proxy(uris[0]) as p:
+        p._pyroSerializer = "marshal"
+        rede = medir_banda(p) / 1e6
+    return hosts, gflops, rede
+
+def ultima_execucao(caminho_run_logs, modo):
+    with open(caminho_run_logs, newline="", encoding="utf8") as f:
+        linhas = [l for l in csv.DictReader(f) if l["modo"] == modo]
+    return linhas[-1] if linhas else None
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--matdir", default="data", help="Diretório das matrizes")
+    parser.add_argument("--outdir", default="results", help="Diretório de saída")
+    parser.add_argument("--formato", choices=FORMATOS, default="auto",
+                        help="Formato das matrizes de entrada (auto: .npy se existir, senão .txt)")
+    parser.add_argument("--benchmarks", default="results/benchmarks.csv",
+                        help="CSV do benchmark.py com as capacidades dos hosts")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Workers candidatos do paralelo local (default: 1, 2, 4, ... núcleos)")
+    parser.add_argument("--backends", nargs="+", default=[],
+                        help="Backends do modo distribuído; o auto testa os k primeiros, k = 1..N")
+    parser.add_argument("--ns-host", default=None, help="Host do nameserver dos backends")
+    parser.add_argument("--ns-port", type=int, default=Pyro5.config.NS_PORT, help="Porta do nameserver")
+    parser.add_argument("--rede-mb-s", type=float, default=None,
+                        help="Banda até os backends (MB/s); default: medida com o primeiro backend")
+    parser.add_argument("--modos", nargs="+", choices=list(SCRIPTS), default=list(SCRIPTS))
+    parser.add_argument("--exato", action="store_true", help="Repassa --exato ao modo escolhido")
+    parser.add_argument("--sem-cache", "--no-cache", dest="sem_cache", action="store_true",
+                        help="Repassa --sem-cache ao modo escolhido")
+    parser.add_argument("--apenas-prever", action="store_true",
+                        help="Só mostra as previsões, sem executar")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    path_matA = localizar_matriz(args.matdir, "matA", args.formato)
+    path_matB = localizar_matriz(args.matdir, "matB", args.formato)
+    (n, k), (_, m) = forma_matriz(path_matA), forma_matriz(path_matB)
+    dims = (n, k, m)
+
+    cap = ler_capacidades(args.benchmarks, socket.gethostname())
+    if cap["padrao"]:
+        print(f"Aviso: sem medida no {args.benchmarks} para {', '.join(cap['padrao'])}; "
+              "usando valores padrão (rode o benchmark.py neste host).")
+
+    # Candidatos: (modo, processos, argumentos do script)
+    candidatos = []
+    if "linear" in args.modos:
+        # O linear multiplica matA_linear x matB_linear: só concorre se for o mesmo tamanho
+        lin_A = localizar_matriz(args.matdir, "matA_linear", args.formato)
+        lin_B = localizar_matriz(args.matdir, "matB_linear", args.formato)
+        if lin_A.exists() and lin_B.exists() and \
+                (forma_matriz(lin_A), forma_matriz(lin_B)) == ((n, k), (k, m)):
+            candidatos.append(("linear", 1, ["--matdir", args.matdir, "--formato", args.formato]))
+    if "paralelo_local" in args.modos:
+        for w in args.workers or candidatos_workers(os.cpu_count() or 1):
+            candidatos.append(("paralelo_local", w, ["--matdir", args.matdir, "--formato", args.formato,
+                                                     "--workers", str(w)]))
+
+    gflops_backends, rede = [], args.rede_mb_s or REDE_PADRAO_MB_S
+    if "distribuido" in args.modos and args.backends:
+        if not args.ns_host:
+            sys.exit("--backends exige --ns-host")
+        if Path(args.matdir).resolve() != Path("data").resolve():
+            # o distributed_client.py lê as matrizes de ./data
+            print("Aviso: o modo distribuído lê ./data; fica fora da escolha com outro --matdir.")
+        else:
+            Pyro5.config.NS_HOST, Pyro5.config.NS_PORT = args.ns_host, args.ns_port
+            hosts, gflops_backends, rede_medida = capacidades_backends(args.backends, args.benchmarks, cap)
+            rede = args.rede_mb_s or rede_medida
+            for i in range(1, len(args.backends) + 1):
+                candidatos.append(("distribuido", i, ["--ns-host", args.ns_host, "--ns-port", str(args.ns_port),
+                                                      "--formato", args.formato,
+                                                      "--backends", *args.backends[:i]]))
+
+    if not candidatos:
+        sys.exit("Nenhum modo candidato para estas matrizes.")
+
+    modelo = ModeloCusto(cap, gflops_backends, rede)
+    modelo.calibrar(ler_historico(f"{args.outdir}/run_logs.csv"))
+
+    previsoes = sorted(((modelo.prever(modo, dims, p), modo, p, extra) for modo, p, extra in candidatos),
+                       key=lambda x: x[0])
+    print(f"\nMatrizes {n}x{k} x {k}x{m} | GFLOPS 1 núcleo: {cap['gflops_nucleo']:.1f} | "
+          f"GFLOPS {os.cpu_count()} threads: {gflops_com_threads(cap, os.cpu_count() or 1):.1f} | "
+          f"rede: {rede:.0f} MB/s")
+    print(f"{'modo':<16}{'p':>4}{'previsto(s)':>14}{'fator':>8}{'amostras':>10}")
+    for previsto, modo, p, _ in previsoes:
+        print(f"{modo:<16}{p:>4}{previsto:>14.4f}{modelo.fatores[modo]:>8.2f}{modelo.amostras[modo]:>10}")
+
+    previsto, modo, p, extra = previsoes[0]
+    print(f"\nEscolhido: {modo} com {p} {'backend(s)' if modo == 'distribuido' else 'processo(s)'} "
+          f"(previsto {previsto:.3f}s)")
+    if args.apenas_prever:
+        return
+
+    cmd = [sys.executable, str(DIRETORIO / SCRIPTS[modo]), "--outdir", args.outdir, *extra]
+    cmd += ["--exato"] * args.exato + ["--sem-cache"] * args.sem_cache
+    raiz = str(DIRETORIO.parent)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [raiz, str(DIRETORIO),
+                                                                   os.environ.get("PYTHONPATH")])))
+    codigo = subprocess.call(cmd, env=env)
+    if codigo != 0:
+        sys.exit(codigo)
+
+    execucao = ultima_execucao(f"{args.outdir}/run_logs.csv", modo)
+    if execucao is None or "cache=hit" in execucao["notas"]:
+        print("Resultado veio do cache; previsão não registrada.")
+        return
+    real = float(execucao["tempo_clock"])
+    registrar_previsao(f"{args.outdir}/auto_previsoes.csv", modo, p, dims, previsto,
+                       modelo.bruto(modo, dims, p), modelo.fatores[modo], real)
+    print(f"Previsto {previsto:.3f}s | real {real:.3f}s ({(previsto - real) / real:+.0%}); "
+          f"registrado em {args.outdir}/auto_previsoes.csv")
+
+if __name__ == "__main__":
+    main()
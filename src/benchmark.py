@@ -1,27 +1,39 @@
 from __future__ import annotations
-import os, time, math, csv, socket, platform
+import os, sys, time, math, csv, socket, platform, json, gzip, pickle, subprocess, argparse
 from pathlib import Path
 from datetime import datetime
-import numpy as np
 
 # Benchmark: mede o desempenho do computador em:
 # Operações escalares com inteiros
 # Operações escalares com ponto flutuante (float)
 # Multiplicação de matrizes (operações de álgebra linear - GFLOPS)
+# Escalabilidade do GEMM de 1..N threads
+# Largura de banda de memória (estilo STREAM: copy/scale/add/triad)
+# Vazão de serialização (pickle/gzip) de matrizes do tamanho de B
 
 #Criação da pasta (results) onde os resultados estão salvos. 
 OUT_DIR = Path("results")
-OUT_DIR.mkdir(parents=True, exist_ok=True)
 OUT_CSV = OUT_DIR / "benchmarks.csv"
 
-# Fixar número de threads para tornar comparável entre hosts
-#Permite comparar as nossas máquinas que possuem diferentes núcleos. 
-os.environ["OMP_NUM_THREADS"] = "1"
-os.environ["OPENBLAS_NUM_THREADS"] = "1"
-os.environ["MKL_NUM_THREADS"] = "1"
-os.environ["BLIS_NUM_THREADS"] = "1"
-os.environ["VECLIB_MAXIMUM_THREADS"] = "1"
-os.environ["NUMEXPR_NUM_THREADS"] = "1"
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+try:
+    import numba
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# Variáveis de threads das bibliotecas nativas. Nada é fixado ao importar este módulo
+# (o linear.py o importa): o run_benchmark limita a BLAS a 1 thread só durante as
+# medições e as seções de escalabilidade rodam em subprocessos com as variáveis
+# definidas antes de o numpy ser carregado.
+VARIAVEIS_THREADS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS",
+                     "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS", "NUMBA_NUM_THREADS")
+
+def ambiente_threads(k: int) -> dict:
+    # Ambiente de um subprocesso com k threads em todas as bibliotecas
+    return dict(os.environ, BENCH_THREADS=str(k), **{var: str(k) for var in VARIAVEIS_THREADS})
 
 #Registra do nome da maquina, CPU, versão do python e timestamp para registar no csv. 
 HOST = socket.gethostname()
@@ -35,6 +47,7 @@ def write_rows(rows):
         "timestamp","host","cpu","python","section","metric","dtype","n",
         "iters","time_s","value","notes"
     ]
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
     file_exists = OUT_CSV.exists()
     with OUT_CSV.open("a", newline="") as f:
         w = csv.DictWriter(f, fieldnames=header)
@@ -98,43 +111,223 @@ def bench_gemm(n: int, dtype=np.float64) -> dict:
     gflops = flops/dt/1e9
     return {"n": n, "dtype": str(dtype), "time_s": dt, "gflops": gflops}
 
-def run_benchmark():
-    rows = []
-    print("\n=== Benchmark iniciado ===")
+# Kernels STREAM: um laço paralelo por operação, como no STREAM original.
+# Sem Numba, caem para NumPy (uma thread; a triad passa duas vezes pela memória).
+if njit is not None:
+    @njit(parallel=True, fastmath=True)
+    def _stream_copy(a, c):
+        for i in prange(a.size):
+            c[i] = a[i]
 
-    # (scalar int) executa os testes e mostra o resultado em operações por segundo
-    print("-> Teste escalar (inteiro)")
-    i = bench_scalar_int()
-    rows.append({
-        "timestamp": STAMP, "host": HOST, "cpu": CPU_INFO, "python": PY_INFO,
-        "section": "scalar", "metric": "int_ops_per_s", "dtype": "", "n": 0,
-        "iters": 0, "time_s": i["time_s"], "value": i["ops"]/i["time_s"], "notes": ""
-    })
-    print("  Ops/s:", i["ops"]/i["time_s"])
+    @njit(parallel=True, fastmath=True)
+    def _stream_scale(b, c, s):
+        for i in prange(c.size):
+            b[i] = s * c[i]
+
+    @njit(parallel=True, fastmath=True)
+    def _stream_add(a, b, c):
+        for i in prange(a.size):
+            c[i] = a[i] + b[i]
+
+    @njit(parallel=True, fastmath=True)
+    def _stream_triad(a, b, c, s):
+        for i in prange(a.size):
+            a[i] = b[i] + s * c[i]
+else:
+    def _stream_copy(a, c):
+        np.copyto(c, a)
+
+    def _stream_scale(b, c, s):
+        np.multiply(c, s, out=b)
+
+    def _stream_add(a, b, c):
+        np.add(a, b, out=c)
+
+    def _stream_triad(a, b, c, s):
+        np.multiply(c, s, out=a)
+        a += b
+
+# Mede a largura de banda de memória (GB/s) no estilo STREAM.
+# Os bytes contados seguem a convenção do STREAM (2 ou 3 vetores de 8 bytes por elemento).
+def bench_stream(n: int = 1 << 24, repeats: int = 5) -> dict:
+    a = np.full(n, 1.0)
+    b = np.full(n, 2.0)
+    c = np.zeros(n)
+    s = 3.0
+    ops = {
+        "copy": (lambda: _stream_copy(a, c), 2),
+        "scale": (lambda: _stream_scale(b, c, s), 2),
+        "add": (lambda: _stream_add(a, b, c), 3),
+        "triad": (lambda: _stream_triad(a, b, c, s), 3),
+    }
+    out = {}
+    for nome, (fn, vetores) in ops.items():
+        fn()  # warm-up (compila o kernel Numba)
+        dt = min_time(fn, repeats)
+        out[nome] = {"time_s": dt, "gb_s": vetores * 8 * n / dt / 1e9}
+    return out
+
+# Executa uma função várias vezes e pega o menor tempo (convenção do STREAM)
+def min_time(fn, repeats=5):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+# Mede a vazão (MB/s) de pickle e gzip sobre uma matriz n x n com 4 casas decimais,
+# como a matB enviada aos backends
+def bench_serializacao(n: int = 2048) -> dict:
+    rng = np.random.default_rng(0)
+    M = np.round(rng.uniform(0.15, 1.15, size=(n, n)), 4)
+    dados = pickle.dumps(M, protocol=pickle.HIGHEST_PROTOCOL)
+    zip_ = gzip.compress(dados)
+    mb = M.nbytes / 1e6
+    ops = {
+        "pickle_dumps": lambda: pickle.dumps(M, protocol=pickle.HIGHEST_PROTOCOL),
+        "pickle_loads": lambda: pickle.loads(dados),
+        "gzip_compress": lambda: gzip.compress(dados),
+        "gzip_decompress": lambda: gzip.decompress(zip_),
+    }
+    out = {}
+    for nome, fn in ops.items():
+        dt = median_time(fn)
+        out[nome] = {"time_s": dt, "mb_s": mb / dt}
+    out["razao_gzip"] = len(dados) / len(zip_)
+    return out
 
-    # scalar float
-    print("-> Teste escalar (float)")
-    f = bench_scalar_float()
+# Roda as seções dependentes do número de threads no próprio processo
+# (chamado em um subprocesso com ambiente_threads(k)) e retorna as linhas
+def medir_com_threads(k: int, n_gemm: int, n_stream: int) -> list:
+    rows = []
+    r = bench_gemm(n=n_gemm)
     rows.append({
-        "timestamp": STAMP, "host": HOST, "cpu": CPU_INFO, "python": PY_INFO,
-        "section": "scalar", "metric": "float_ops_per_s", "dtype": "", "n": 0,
-        "iters": 0, "time_s": f["time_s"], "value": f["ops"]/f["time_s"], "notes": ""
+        "section": "gemm_threads", "metric": "gflops", "dtype": "float64", "n": n_gemm,
+        "iters": 1, "time_s": r["time_s"], "value": r["gflops"], "notes": f"threads={k}"
     })
-    print("  Ops/s:", f["ops"]/f["time_s"])
+    nota_stream = f"threads={k}" + ("" if njit is not None else ";numpy")
+    for nome, r in bench_stream(n=n_stream).items():
+        rows.append({
+            "section": "stream", "metric": f"{nome}_gb_s", "dtype": "float64", "n": n_stream,
+            "iters": 5, "time_s": r["time_s"], "value": r["gb_s"], "notes": nota_stream
+        })
+    return rows
+
+# Quantidades de threads testadas: potências de 2 até N, incluindo N
+def contagens_threads(maximo: int) -> list:
+    contagens, k = [], 1
+    while k < maximo:
+        contagens.append(k)
+        k *= 2
+    contagens.append(maximo)
+    return contagens
+
+# Executa medir_com_threads em um subprocesso por quantidade de threads, pois a BLAS
+# fixa o número de threads ao ser carregada
+def bench_escalabilidade(threads_max: int, n_gemm: int, n_stream: int) -> list:
+    rows = []
+    base = {}
+    for k in contagens_threads(threads_max):
+        print(f"-> GEMM/STREAM com {k} thread(s)")
+        env = ambiente_threads(k)
+        cmd = [sys.executable, __file__, "--filho", "--n-gemm", str(n_gemm), "--n-stream", str(n_stream)]
+        saida = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+        for r in json.loads(saida.stdout.strip().splitlines()[-1]):
+            chave = (r["section"], r["metric"])
+            base.setdefault(chave, r["value"])
+            r["notes"] += f";speedup={r['value'] / base[chave]:.2f}"
+            rows.append(r)
+            print(f"   {r['section']}/{r['metric']}: {r['value']:.2f} ({r['notes']})")
+    return rows
+
+SECOES = ("scalar", "gemm", "threads", "serializacao")
+
+def run_benchmark(secoes=SECOES, threads_max=None, n_gemm_threads=2048,
+                  n_stream=1 << 24, n_serializacao=2048):
+    # Fixar número de threads para tornar comparável entre hosts
+    # Permite comparar as nossas máquinas que possuem diferentes núcleos.
+    with threadpool_limits(limits=1):
+        medir_secoes(secoes, threads_max, n_gemm_threads, n_stream, n_serializacao)
 
-    # GEMM FLOAT64 — tamanhos menores e mais rápidos (2048x2048 e 4096x4096)
-    for n in (2048, 4096):
-        print(f"-> GEMM: n={n}, dtype=float64")
-        r = bench_gemm(n=n)
+def medir_secoes(secoes, threads_max, n_gemm_threads, n_stream, n_serializacao):
+    rows = []
+    print("\n=== Benchmark iniciado ===")
+    comum = {"timestamp": STAMP, "host": HOST, "cpu": CPU_INFO, "python": PY_INFO}
+
+    if "scalar" in secoes:
+        # (scalar int) executa os testes e mostra o resultado em operações por segundo
+        print("-> Teste escalar (inteiro)")
+        i = bench_scalar_int()
+        rows.append({
+            **comum,
+            "section": "scalar", "metric": "int_ops_per_s", "dtype": "", "n": 0,
+            "iters": 0, "time_s": i["time_s"], "value": i["ops"]/i["time_s"], "notes": ""
+        })
+        print("  Ops/s:", i["ops"]/i["time_s"])
+
+        # scalar float
+        print("-> Teste escalar (float)")
+        f = bench_scalar_float()
         rows.append({
-            "timestamp": STAMP, "host": HOST, "cpu": CPU_INFO, "python": PY_INFO,
-            "section": "gemm", "metric": "gflops", "dtype": "float64", "n": n,
-            "iters": 1, "time_s": r["time_s"], "value": r["gflops"], "notes": ""
+            **comum,
+            "section": "scalar", "metric": "float_ops_per_s", "dtype": "", "n": 0,
+            "iters": 0, "time_s": f["time_s"], "value": f["ops"]/f["time_s"], "notes": ""
         })
-        print(f"   {r['gflops']:.2f} GFLOPS, time={r['time_s']:.3f}s")
+        print("  Ops/s:", f["ops"]/f["time_s"])
+
+    if "gemm" in secoes:
+        # GEMM FLOAT64 — tamanhos menores e mais rápidos (2048x2048 e 4096x4096)
+        for n in (2048, 4096):
+            print(f"-> GEMM: n={n}, dtype=float64")
+            r = bench_gemm(n=n)
+            rows.append({
+                **comum,
+                "section": "gemm", "metric": "gflops", "dtype": "float64", "n": n,
+                "iters": 1, "time_s": r["time_s"], "value": r["gflops"], "notes": ""
+            })
+            print(f"   {r['gflops']:.2f} GFLOPS, time={r['time_s']:.3f}s")
+
+    if "threads" in secoes:
+        for r in bench_escalabilidade(threads_max or os.cpu_count() or 1, n_gemm_threads, n_stream):
+            rows.append({**comum, **r})
+
+    if "serializacao" in secoes:
+        print(f"-> Serialização: matriz {n_serializacao}x{n_serializacao}")
+        r = bench_serializacao(n=n_serializacao)
+        razao = r.pop("razao_gzip")
+        for nome, v in r.items():
+            rows.append({
+                **comum,
+                "section": "serializacao", "metric": f"{nome}_mb_s", "dtype": "float64",
+                "n": n_serializacao, "iters": 3, "time_s": v["time_s"], "value": v["mb_s"],
+                "notes": f"razao_gzip={razao:.2f}"
+            })
+            print(f"   {nome}: {v['mb_s']:.1f} MB/s")
 
     write_rows(rows)
     print("Benchmark salvo em:", OUT_CSV)
 
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--secoes", nargs="+", choices=SECOES, default=list(SECOES))
+    parser.add_argument("--threads-max", type=int, default=None,
+                        help="maior número de threads testado (padrão: núcleos da máquina)")
+    parser.add_argument("--n-gemm", type=int, default=2048, help="n do GEMM na seção de threads")
+    parser.add_argument("--n-stream", type=int, default=1 << 24, help="elementos por vetor no STREAM")
+    parser.add_argument("--n-serializacao", type=int, default=2048)
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.filho:
+        # O pai já definiu as variáveis de threads antes do numpy carregar; os limites
+        # em tempo de execução garantem o mesmo se o filho for chamado à mão
+        k = int(os.environ.get("BENCH_THREADS", "1"))
+        if njit is not None:
+            numba.set_num_threads(min(k, numba.config.NUMBA_NUM_THREADS))
+        with threadpool_limits(limits=k):
+            print(json.dumps(medir_com_threads(k, args.n_gemm, args.n_stream)))
+    else:
+        run_benchmark(args.secoes, args.threads_max, args.n_gemm, args.n_stream, args.n_serializacao)
+
 if __name__ == "__main__":
-    run_benchmark()
\ No newline at end of file
+    main()
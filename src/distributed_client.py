@@ -1,5 +1,8 @@
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import queue
 from pathlib import Path
 import Pyro5.api
 import numpy as np
@@ -7,26 +10,149 @@ import csv
 import sys
 from os.path import dirname, abspath
 sys.path.insert(0, abspath(dirname(dirname(__file__))))
-from utils.hash_check import sha256_of_file, save_hash
-import argparse
-import gzip
-import gzip
-import pickle
+from utils.hash_check import sha256_of_bytes, save_hash
+from utils.checkpoint import CheckpointBlocos, chave_job
+from utils.wire import codificar_array, decodificar_array
+from utils.ordered_writer import EscritorOrdenado, escrever_matriz
+from utils.formatting import formatar_truncado
+from utils.matrix_io import FORMATOS, carregar_matriz, localizar_matriz
+from utils.timer import Rastreador, formatar_notas
+from utils.ponto_fixo import formatar_produto, para_ponto_fixo, verificar_overflow_entradas
+from utils.cache_resultados import CacheResultados, servir_do_cache
+from utils.compressao import codecs_disponiveis, desempacotar, empacotar, escolher_codec, medir_codecs
+import os
+
+# B codificada uma única vez por job (wire.codificar_array). O SHA-256 do buffer
+# identifica B no cache dos backends, e cada versão comprimida só é gerada (uma vez
+# por codec) se algum backend ainda não tiver essa B.
+class PacoteB:
+    def __init__(self, matB, rastreador=None):
+        self.rastreador = rastreador or Rastreador()
+        with self.rastreador.intervalo("codificar_B"):
+            self.dados = codificar_array(matB)
+        with self.rastreador.intervalo("hash_B"):
+            self.hash = sha256_of_bytes(self.dados)
+        self._comprimidos = {}
+        self._medidas = None
+        self._lock = threading.Lock()
+
+    def comprimido(self, codec):
+        with self._lock:
+            if codec not in self._comprimidos:
+                with self.rastreador.intervalo("compressao_B", bytes=len(self.dados), codec=codec):
+                    self._comprimidos[codec] = empacotar(self.dados, codec)
+            return self._comprimidos[codec]
+
+    def medidas_codecs(self, tamanho_amostra=512 * 1024):
+        # Razão e vazão de cada codec numa amostra de B (medido uma vez por job)
+        with self._lock:
+            if self._medidas is None:
+                with self.rastreador.intervalo("sonda_codecs"):
+                    self._medidas = medir_codecs(self.dados[:tamanho_amostra])
+            return self._medidas
+
+def _cronometrar(fn):
+    inicio = time.perf_counter()
+    fn()
+    return time.perf_counter() - inicio
+
+# Mede a banda (bytes/s) do enlace com o backend: a latência vem de chamadas vazias
+# e a banda do envio de `tamanho` bytes aleatórios (incompressíveis)
+def medir_banda(proxy, tamanho=1 << 20):
+    latencia = min(_cronometrar(lambda: proxy.sonda(b"")) for _ in range(3))
+    dados = os.urandom(tamanho)
+    duracao = min(_cronometrar(lambda: proxy.sonda(dados)) for _ in range(2))
+    return tamanho / max(duracao - latencia, 1e-6)
+
+# Escolhe o codec que minimiza comprimir + transmitir + descomprimir neste enlace,
+# entre os codecs instalados no cliente e no backend. O mesmo codec vale para B,
+# blocos de A e blocos de C (todos são matrizes float64 da mesma natureza).
+def escolher_codec_backend(proxy, medidas, rastreador, tamanho=1 << 20):
+    comuns = set(proxy.codecs_disponiveis())
+    medidas = {nome: m for nome, m in medidas.items() if nome in comuns}
+    with rastreador.intervalo("sonda_banda"):
+        banda = medir_banda(proxy)
+    return escolher_codec(medidas, tamanho, banda), banda
+
+# Incorpora ao rastreador do cliente os spans devolvidos por um backend.
+# Os relógios das máquinas não são sincronizados: o meio do atendimento no
+# servidor é alinhado ao meio da chamada medida no cliente. Retorna o tempo de
+# comunicação da chamada (chamada no cliente menos atendimento no servidor).
+def incorporar_spans_servidor(rastreador, spans, chamada, nome_atendimento):
+    atendimento = next(s for s in spans if s["nome"] == nome_atendimento)
+    deslocamento = ((chamada["inicio"] + chamada["duracao"] / 2)
+                    - (atendimento["inicio"] + atendimento["duracao"] / 2))
+    rastreador.incorporar(spans, deslocamento)
+    return max(0.0, chamada["duracao"] - atendimento["duracao"])
 
-# Envia B inteira comprimida para o servidor para a multiplicação
-def enviar_B_compressa(proxy, matB):
-    dados = pickle.dumps(matB, protocol=4)
-    dados_zip = gzip.compress(dados)
+# Envia B inteira comprimida com `codec` para o servidor, a menos que
+# o servidor já tenha a mesma B (mesmo hash) no cache.
+# Retorna (enviou, tempo de comunicação).
+def enviar_B_compressa(proxy, pacote_B, sessao_id=None, codec="zlib-1"):
+    rastreador = pacote_B.rastreador
+    with rastreador.intervalo("consulta_cache_B") as consulta:
+        em_cache = proxy.tem_matriz_B(pacote_B.hash, sessao_id)
+    if em_cache:
+        print(f"Servidor já possui B ({pacote_B.hash[:12]}...), envio dispensado")
+        return False, consulta["duracao"]
 
-    print(f"Enviando matriz B comprimida ({len(dados_zip)/1024/1024:.2f} MB)")
-    proxy.set_matriz_B_compressa(dados_zip)
+    dados_zip = pacote_B.comprimido(codec)
+    print(f"Enviando matriz B ({codec}, {len(dados_zip)/1024/1024:.2f} MB)")
+    with rastreador.intervalo("envio_B", bytes=len(dados_zip)) as chamada:
+        _, spans = proxy.set_matriz_B_codificada(dados_zip, pacote_B.hash, sessao_id, True)
+    comunicacao = incorporar_spans_servidor(rastreador, spans, chamada, "atendimento_B")
+    return True, consulta["duracao"] + comunicacao
 
 # Define onde o nameserver está rodando e quais backends usar
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--backends", nargs="+", required=True)
     parser.add_argument("--ns-host", required=True)
-    return parser.parse_args()
+    parser.add_argument("--ns-port", type=int, default=Pyro5.config.NS_PORT, help="Porta do nameserver")
+    parser.add_argument("--outdir", default="results", help="Diretório de saída")
+    parser.add_argument("--formato", choices=FORMATOS, default="auto",
+                        help="Formato das matrizes de entrada (auto: .npy se existir, senão .txt)")
+    parser.add_argument("--linhas-chunk", type=int, default=64,
+                        help="Linhas de A por chunk da fila dinâmica")
+    parser.add_argument("--pesos", default=None,
+                        help="CSV do benchmark.py (ex.: results/benchmarks.csv) para pesar os backends por GFLOPS")
+    parser.add_argument("--timeout", type=float, default=600.0,
+                        help="Timeout (s) de cada chamada remota; backend que estourar é descartado")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="Diretório dos checkpoints (default: <outdir>/checkpoints)")
+    parser.add_argument("--sem-checkpoint", action="store_true",
+                        help="Não salvar nem retomar blocos de execuções anteriores")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Gravar matC.txt enquanto os blocos chegam (memória limitada; "
+                             "o tempo medido passa a incluir a escrita)")
+    parser.add_argument("--modo", choices=["linhas", "summa"], default="linhas",
+                        help="linhas: B replicada e linhas de A em chunks; summa: grade 2D de "
+                             "backends, cada um com um tile de C (sem B inteira nos servidores)")
+    parser.add_argument("--grade", default=None,
+                        help="Grade do modo summa como LINHASxCOLUNAS (default: a mais quadrada)")
+    parser.add_argument("--painel", type=int, default=256,
+                        help="Largura dos painéis de A/B por rodada no modo summa")
+    parser.add_argument("--codec", choices=["auto"] + codecs_disponiveis(), default="auto",
+                        help="Compressão de B, blocos de A e blocos de C (auto: mede banda e "
+                             "vazão dos codecs e escolhe o de menor tempo total por backend)")
+    parser.add_argument("--exato", action="store_true",
+                        help="Multiplicação exata em ponto fixo int64 (entradas com 4 casas): "
+                             "o hash não depende da divisão do trabalho nem do modo")
+    parser.add_argument("--pipeline", type=int, default=0, metavar="PROFUNDIDADE",
+                        help="Modo linhas: sub-chunks em voo por backend no protocolo em pipeline "
+                             "(envio, cálculo e retorno sobrepostos); 0 desativa")
+    parser.add_argument("--linhas-subchunk", type=int, default=16,
+                        help="Linhas de A por sub-chunk do pipeline")
+    parser.add_argument("--trace", default=None,
+                        help="Arquivo da linha do tempo Chrome trace (default: <outdir>/trace.json)")
+    parser.add_argument("--sem-cache", "--no-cache", dest="sem_cache", action="store_true",
+                        help="Recalcula mesmo se o resultado deste (A, B) já estiver no cache (só --exato)")
+    parser.add_argument("--cache-dir", default="results/cache", help="Diretório do cache de resultados")
+    parser.add_argument("--cache-mb", type=float, default=2048, help="Tamanho máximo do cache (MB, LRU)")
+    args = parser.parse_args()
+    if args.pipeline and args.modo == "summa":
+        parser.error("--pipeline vale só para o modo linhas")
+    return args
 
 # Retorna timestamp atual formatado como YYYY-MM-DD HH:MM:SS
 def agora_ts():
@@ -46,59 +172,512 @@ def adicionar_log(caminho_csv, linha, cabecalho=None):
             escritor.writerow(cabecalho)
         escritor.writerow(linha)
 
-def dividir_blocos(matA, num_blocos):
-    # Divide as linhas da matriz em blocos de forma uniforme
-    total_linhas = len(matA)
-    blocos = []
-    linhas_por_bloco = total_linhas // num_blocos
-    resto = total_linhas % num_blocos
-    inicio = 0
-    for i in range(num_blocos):
-        fim = inicio + linhas_por_bloco + (1 if i < resto else 0)
-        blocos.append(matA[inicio:fim])
-        inicio = fim
-    return blocos
+class FilaDeLinhas:
+    # Fila dinâmica de intervalos de linhas de A (work-stealing)
+    # Cada backend pega o próximo intervalo assim que termina o anterior,
+    # então backends rápidos processam mais linhas e um host lento não
+    # define sozinho o tempo total. Intervalos de um backend que falhou
+    # são devolvidos à fila e reatribuídos aos backends saudáveis.
+    def __init__(self, total_linhas, linhas_por_chunk, concluidos=()):
+        self.linhas_por_chunk = max(1, linhas_por_chunk)
+        self.em_andamento = 0
+        self.cond = threading.Condition()
+        # Lacunas ainda não calculadas (exclui intervalos já concluídos no checkpoint)
+        self.pendentes = []
+        linha = 0
+        for inicio, fim in sorted(concluidos):
+            if inicio > linha:
+                self.pendentes.append((linha, inicio))
+            linha = max(linha, fim)
+        if linha < total_linhas:
+            self.pendentes.append((linha, total_linhas))
+
+    def proximo(self, peso=1.0):
+        # Retorna (inicio, fim) do próximo chunk ou None quando acabou.
+        # O peso relativo do backend escala o tamanho do chunk. Se não há
+        # pendentes mas ainda há chunks em andamento, espera: eles podem
+        # voltar para a fila caso o backend responsável falhe.
+        with self.cond:
+            while not self.pendentes and self.em_andamento > 0:
+                self.cond.wait()
+            if not self.pendentes:
+                return None
+            inicio, fim_lacuna = self.pendentes.pop(0)
+            tamanho = max(1, int(round(self.linhas_por_chunk * peso)))
+            fim = min(inicio + tamanho, fim_lacuna)
+            if fim < fim_lacuna:
+                self.pendentes.insert(0, (fim, fim_lacuna))
+            self.em_andamento += 1
+            return inicio, fim
+
+    def concluir(self, intervalo):
+        with self.cond:
+            self.em_andamento -= 1
+            self.cond.notify_all()
+
+    def devolver(self, intervalo):
+        # Recoloca o intervalo no início da fila para ser reatribuído
+        with self.cond:
+            self.em_andamento -= 1
+            self.pendentes.insert(0, intervalo)
+            self.cond.notify_all()
+
+    def restantes(self):
+        with self.cond:
+            return sum(fim - inicio for inicio, fim in self.pendentes)
+
+def ler_gflops_benchmark(caminho_csv):
+    # Lê o results/benchmarks.csv gerado pelo benchmark.py e retorna
+    # {host: GFLOPS} usando o GEMM float64 de maior n mais recente de cada host
+    p = Path(caminho_csv)
+    if not p.exists():
+        print(f"Aviso: {caminho_csv} não encontrado, usando pesos iguais.")
+        return {}
+    melhores = {}
+    with open(p, newline="", encoding="utf8") as f:
+        for linha in csv.DictReader(f):
+            if linha.get("section") != "gemm" or linha.get("dtype") != "float64":
+                continue
+            try:
+                n = int(linha["n"])
+                gflops = float(linha["value"])
+            except (TypeError, ValueError):
+                continue
+            host = linha.get("host")
+            # linhas posteriores (mais recentes) substituem as anteriores para o mesmo n
+            if host not in melhores or n >= melhores[host][0]:
+                melhores[host] = (n, gflops)
+    return {host: gflops for host, (_, gflops) in melhores.items()}
+
+def calcular_pesos(hosts, gflops_por_host):
+    # Converte GFLOPS por host em pesos relativos (média 1.0) por backend
+    # Hosts sem benchmark recebem a média dos conhecidos
+    conhecidos = [gflops_por_host[h] for h in hosts if gflops_por_host.get(h, 0) > 0]
+    if not conhecidos:
+        return [1.0] * len(hosts)
+    padrao = sum(conhecidos) / len(conhecidos)
+    valores = [gflops_por_host.get(h, 0) or padrao for h in hosts]
+    media = sum(valores) / len(valores)
+    return [v / media for v in valores]
+
+# Codifica (e comprime) as linhas ini..fim de A para envio; no modo exato o bloco
+# vai em ponto fixo int64
+def codificar_bloco_A(matA, ini, fim, exato, codec, rastreador):
+    with rastreador.intervalo("codificar_A", linhas=fim - ini):
+        bloco_A = para_ponto_fixo(matA[ini:fim]) if exato else matA[ini:fim]
+        dados_A = codificar_array(bloco_A)
+    with rastreador.intervalo("compressao_A", codec=codec):
+        return empacotar(dados_A, codec)
+
+def decodificar_bloco_C(dados_C, codec, rastreador):
+    with rastreador.intervalo("descompressao_C", codec=codec):
+        dados_C = desempacotar(dados_C)
+    with rastreador.intervalo("decodificar_C"):
+        return decodificar_array(dados_C)
+
+# Destino de um bloco de C pronto: checkpoint, escrita em fluxo ou dicionário de resultados
+def entregar_bloco(ini, fim, bloco, resultados, checkpoint, saida, rastreador):
+    if checkpoint is not None:
+        with rastreador.intervalo("checkpoint"):
+            checkpoint.salvar(ini, fim, bloco)
+    if saida is not None:
+        with rastreador.intervalo("escrita", linhas=fim - ini):
+            saida.adicionar(ini, bloco)
+    else:
+        resultados[ini] = bloco
+
+# Protocolo em pipeline de um backend: uma thread de envio (com proxy próprio) puxa
+# chunks da fila, corta cada um em sub-chunks de `linhas_subchunk` linhas e os envia
+# sem esperar o resultado; a thread do backend busca os resultados na mesma ordem.
+# O semáforo `vagas` limita os sub-chunks em voo a `profundidade`, então o envio do
+# sub-chunk k+1, o cálculo do k no servidor e o retorno do k-1 se sobrepõem.
+class PipelineBackend:
+    def __init__(self, uri, sessao_id, matA, fila, peso, timeout, codec, exato, rastreador,
+                 profundidade, linhas_subchunk):
+        self.uri = uri
+        self.sessao_id = sessao_id
+        self.matA = matA
+        self.fila = fila
+        self.peso = peso
+        self.timeout = timeout
+        self.codec = codec
+        self.exato = exato
+        self.rastreador = rastreador
+        self.linhas_subchunk = linhas_subchunk
+        self.vagas = threading.Semaphore(profundidade)
+        self.pendentes = queue.Queue()
+        # chunks retirados da fila e ainda não concluídos (devolvidos se o backend falhar)
+        self.abertos = []
+        self.lock = threading.Lock()
+        self.parar = threading.Event()
+        self.erro = None
+        self.comunicacao_envio = 0.0
+        self.comunicacao_retorno = 0.0
+        self.processamento = 0.0
+
+    def enviar(self):
+        seq = 0
+        try:
+            with Pyro5.api.Proxy(self.uri) as p:
+                p._pyroTimeout = self.timeout
+                p._pyroSerializer = "marshal"
+                while not self.parar.is_set():
+                    intervalo = self.fila.proximo(self.peso)
+                    if intervalo is None:
+                        break
+                    with self.lock:
+                        if self.parar.is_set():
+                            self.fila.devolver(intervalo)
+                            return
+                        self.abertos.append(intervalo)
+                    ini, fim = intervalo
+                    for a in range(ini, fim, self.linhas_subchunk):
+                        b = min(a + self.linhas_subchunk, fim)
+                        while not self.vagas.acquire(timeout=0.5):
+                            if self.parar.is_set():
+                                return
+                        dados_A = codificar_bloco_A(self.matA, a, b, self.exato, self.codec, self.rastreador)
+                        with self.rastreador.intervalo("envio_subchunk", uri=self.uri, seq=seq,
+                                                       bytes=len(dados_A)) as chamada:
+                            _, spans = p.enviar_subchunk(seq, dados_A, self.sessao_id, True)
+                        self.comunicacao_envio += incorporar_spans_servidor(
+                            self.rastreador, spans, chamada, "atendimento_envio")
+                        self.pendentes.put((seq, intervalo, b == fim))
+                        seq += 1
+        except Exception as e:
+            self.erro = e
+        finally:
+            self.pendentes.put(None)
+
+    def receber(self, p, entregar):
+        # `entregar(ini, fim, bloco)` recebe cada chunk remontado a partir dos seus sub-chunks
+        partes = []
+        while True:
+            item = self.pendentes.get()
+            if item is None:
+                break
+            seq, intervalo, ultimo = item
+            with self.rastreador.intervalo("recebimento_subchunk", uri=self.uri, seq=seq) as chamada:
+                dados_C, spans = p.receber_subchunk(seq, self.sessao_id, True)
+            self.vagas.release()
+            self.comunicacao_retorno += incorporar_spans_servidor(
+                self.rastreador, spans, chamada, "atendimento_recebimento")
+            self.processamento += sum(s["duracao"] for s in spans if s["nome"] == "processamento")
+            partes.append(decodificar_bloco_C(dados_C, self.codec, self.rastreador))
+            if ultimo:
+                bloco = partes[0] if len(partes) == 1 else np.concatenate(partes)
+                partes = []
+                with self.lock:
+                    entregar(intervalo[0], intervalo[1], bloco)
+                    self.abertos.remove(intervalo)
+        if self.erro is not None:
+            raise self.erro
+
+    def interromper(self):
+        # Para o envio e devolve à fila os chunks em voo; a thread de envio pode estar
+        # esperando na fila justamente por esses chunks, então eles voltam antes do join
+        with self.lock:
+            self.parar.set()
+            for intervalo in self.abertos:
+                print(f"\t        linhas {intervalo[0]}..{intervalo[1]} devolvidas para a fila")
+                self.fila.devolver(intervalo)
+            self.abertos.clear()
+
+# Resumo do pipeline de um backend: transferência é o tempo de rede das chamadas de
+# envio e retorno, processamento é o tempo da thread de cálculo no servidor. Sem
+# sobreposição a parede seria a soma dos dois; o que falta até essa soma é a
+# transferência escondida atrás do cálculo.
+def transferencia_oculta(transferencia, processamento, parede):
+    return min(transferencia, max(0.0, transferencia + processamento - parede))
+
+# Executa o trabalho de um backend em sua própria thread, com seu próprio proxy
+# (proxies Pyro5 não devem ser compartilhados entre threads).
+# O backend puxa chunks da fila até ela esvaziar. Se o backend cair ou estourar
+# o timeout, os chunks em andamento voltam para a fila e o backend é descartado.
+# Cada fase (codificação, chamada remota, decodificação, escrita) vira um span
+# no rastreador de pacote_B; os spans do servidor voltam junto com cada resultado.
+# profundidade > 0 usa o protocolo em pipeline (PipelineBackend) em vez de uma
+# chamada multiplicar_linhas por chunk.
+def executar_backend(uri, matA, pacote_B, fila, resultados, peso=1.0, timeout=None, checkpoint=None,
+                     saida=None, codec="auto", exato=False, profundidade=0, linhas_subchunk=16):
+    tempos = {"uri": uri, "envio_B": 0.0, "multiplicacao": 0.0, "comunicacao": 0.0, "chunks": 0,
+              "linhas": 0, "B_em_cache": False, "falhou": False, "codec": codec,
+              "comunicacao_oculta": 0.0}
+    rastreador = pacote_B.rastreador
+    abertos = []
+
+    def entregar(ini, fim, bloco):
+        entregar_bloco(ini, fim, bloco, resultados, checkpoint, saida, rastreador)
+        fila.concluir((ini, fim))
+        tempos["chunks"] += 1
+        tempos["linhas"] += fim - ini
+
+    try:
+        with Pyro5.api.Proxy(uri) as p:
+            p._pyroTimeout = timeout
+            # marshal transporta bytes sem codificação base64 (ao contrário do serpent)
+            p._pyroSerializer = "marshal"
+            print(f"\tConectando ao servidor {uri}...")
+            # Cada job tem sua própria sessão no backend (B e estado separados)
+            with rastreador.intervalo("abrir_sessao", uri=uri) as span:
+                sessao_id = p.abrir_sessao()
+            tempos["comunicacao"] += span["duracao"]
+            if codec == "auto":
+                codec, banda = escolher_codec_backend(p, pacote_B.medidas_codecs(), rastreador,
+                                                      len(pacote_B.dados))
+                tempos["codec"] = codec
+                print(f"\t{uri}: banda ~{banda/1024/1024:.1f} MB/s -> codec {codec}")
+            inicio = time.time()
+            enviou, comunicacao = enviar_B_compressa(p, pacote_B, sessao_id, codec)
+            tempos["B_em_cache"] = not enviou
+            tempos["comunicacao"] += comunicacao
+            tempos["envio_B"] = time.time() - inicio
+
+            if profundidade > 0:
+                p.iniciar_pipeline(sessao_id, profundidade, codec)
+                pipeline = PipelineBackend(uri, sessao_id, matA, fila, peso, timeout, codec, exato,
+                                           rastreador, profundidade, linhas_subchunk)
+                envio = threading.Thread(target=pipeline.enviar, name=f"envio-{uri}")
+                inicio = time.time()
+                envio.start()
+                try:
+                    pipeline.receber(p, entregar)
+                except Exception:
+                    pipeline.interromper()
+                    raise
+                finally:
+                    pipeline.parar.set()
+                    envio.join()
+                parede = time.time() - inicio
+                tempos["multiplicacao"] = parede
+                transferencia = pipeline.comunicacao_envio + pipeline.comunicacao_retorno
+                oculta = transferencia_oculta(transferencia, pipeline.processamento, parede)
+                tempos["comunicacao"] += transferencia
+                tempos["comunicacao_oculta"] = oculta
+                rastreador.registrar("pipeline", inicio, parede, 0.0, uri=uri, profundidade=profundidade,
+                                     linhas_subchunk=linhas_subchunk, transferencia_s=transferencia,
+                                     processamento_s=pipeline.processamento, transferencia_oculta_s=oculta)
+                print(f"\t{uri}: pipeline com {transferencia:.2f}s de transferência, "
+                      f"{oculta:.2f}s escondidos atrás do cálculo ({pipeline.processamento:.2f}s)")
+                p.encerrar_pipeline(sessao_id)
+            else:
+                while True:
+                    intervalo = fila.proximo(peso)
+                    if intervalo is None:
+                        break
+                    abertos.append(intervalo)
+                    ini, fim = intervalo
+                    inicio = time.time()
+                    dados_A = codificar_bloco_A(matA, ini, fim, exato, codec, rastreador)
+                    with rastreador.intervalo("chamada", uri=uri, inicio=ini, fim=fim, bytes=len(dados_A)) as chamada:
+                        dados_C, spans = p.multiplicar_linhas(dados_A, sessao_id, True, codec)
+                    tempos["comunicacao"] += incorporar_spans_servidor(rastreador, spans, chamada, "atendimento")
+                    bloco = decodificar_bloco_C(dados_C, codec, rastreador)
+                    tempos["multiplicacao"] += time.time() - inicio
+                    entregar(ini, fim, bloco)
+                    abertos.remove(intervalo)
+            p.fechar_sessao(sessao_id)
+    except Exception as e:
+        tempos["falhou"] = True
+        print(f"\t[FALHA] {uri}: {type(e).__name__}: {e}")
+        for intervalo in abertos:
+            print(f"\t        linhas {intervalo[0]}..{intervalo[1]} devolvidas para a fila")
+            fila.devolver(intervalo)
+    tempos["total"] = tempos["envio_B"] + tempos["multiplicacao"]
+    print(f"\t{uri}: {tempos['chunks']} chunks, {tempos['linhas']} linhas")
+    return tempos
+
+# Consulta o hostname de cada backend para associar aos GFLOPS do benchmark
+def hosts_dos_backends(uris_backends):
+    hosts = []
+    for uri in uris_backends:
+        with Pyro5.api.Proxy(uri) as p:
+            hosts.append(p.get_host())
+    return hosts
 
 # Realiza a multiplicação distribuída de matrizes
-def multiplicacao_distribuida(matA, matB, uris_backends):
+# Envio de B e processamento acontecem em paralelo para todos os backends, e as
+# linhas de A são distribuídas dinamicamente em chunks (work-stealing), então
+# o tempo total é limitado pelo conjunto, e não pelo backend mais lento.
+# Com checkpoint, blocos já salvos de uma execução anterior não são recalculados.
+# Com `saida` (EscritorOrdenado), cada bloco é gravado assim que chega e a matriz C
+# completa nunca fica em memória; nesse caso retorna matC = None.
+# As fases do cliente e dos backends são registradas em `rastreador` (utils.timer.Rastreador).
+# profundidade > 0 ativa o protocolo em pipeline (transferência sobreposta ao cálculo).
+def multiplicacao_distribuida(matA, matB, uris_backends, linhas_por_chunk=64, pesos=None,
+                              timeout=None, checkpoint=None, saida=None, rastreador=None, codec="auto",
+                              exato=False, profundidade=0, linhas_subchunk=16):
 
     num_servidores = len(uris_backends)
-    blocos = dividir_blocos(matA, num_servidores)
+    if pesos is None:
+        pesos = [1.0] * num_servidores
 
-    tempo_total_comunicacao = 0.0
-    resultados_blocos = [None] * num_servidores
+    resultados = {}
+    if checkpoint is not None:
+        for inicio, (fim, bloco) in checkpoint.carregar().items():
+            resultados[inicio] = bloco
+        if resultados:
+            print(f"\tRetomando: {sum(len(b) for b in resultados.values())} linhas já calculadas no checkpoint")
+    concluidos = [(inicio, inicio + len(bloco)) for inicio, bloco in resultados.items()]
+    fila = FilaDeLinhas(len(matA), linhas_por_chunk, concluidos)
+    if saida is not None:
+        for inicio in sorted(resultados):
+            saida.adicionar(inicio, resultados.pop(inicio))
 
     inicio_clock = time.time()
     inicio_cpu = time.process_time()
 
-    proxies = []
-    for uri in uris_backends:
-        print(f"\tConectando ao servidor {uri}...")
-        p = Pyro5.api.Proxy(uri)
-        enviar_B_compressa(p, matB)
-        print(f"\tEnviando matriz B para servidor {uri}...")
-        proxies.append(p)
-
-    for i, p in enumerate(proxies):
-        print(f"\tEnviando bloco {i} para servidor...")
-        inicio_chamada = time.time()
-        res = p.multiplicar_linhas(blocos[i])
-        fim_chamada = time.time()
-        tempo_total_comunicacao += (fim_chamada - inicio_chamada)
-        resultados_blocos[i] = res
+    # Modo exato: A e B em int64 escala 10^4 (utils.ponto_fixo), C em escala 10^8
+    if exato:
+        verificar_overflow_entradas(matA, matB)
+        matB = para_ponto_fixo(matB)
+    pacote_B = PacoteB(matB, rastreador)
+
+    with ThreadPoolExecutor(max_workers=num_servidores) as executor:
+        futuros = [executor.submit(executar_backend, uri, matA, pacote_B, fila, resultados,
+                                   pesos[i], timeout, checkpoint, saida, codec, exato,
+                                   profundidade, linhas_subchunk)
+                   for i, uri in enumerate(uris_backends)]
+        tempos_backends = [futuro.result() for futuro in futuros]
 
     fim_clock = time.time()
     fim_cpu = time.process_time()
 
+    # Todos os backends caíram antes de terminar: os blocos concluídos continuam
+    # no checkpoint e uma nova execução retoma a partir deles
+    restantes = fila.restantes()
+    if restantes:
+        raise RuntimeError(f"Todos os backends falharam; {restantes} linhas de A não foram calculadas.")
+
     tempo_clock = fim_clock - inicio_clock
     tempo_cpu = fim_cpu - inicio_cpu
+    # Comunicação = tempo das chamadas remotas menos o atendimento medido no servidor
+    # (rede + serialização do Pyro5). Com as chamadas sobrepostas, vale a do backend
+    # com mais comunicação, não a soma dos backends
+    tempo_total_comunicacao = max(t["comunicacao"] for t in tempos_backends)
+
+    if saida is not None:
+        return None, tempo_clock, tempo_cpu, tempo_total_comunicacao, tempos_backends
+
+    # Juntar resultados na ordem das linhas de A
+    matC = np.empty((matA.shape[0], matB.shape[1]), dtype=np.int64 if exato else np.float64)
+    for inicio, bloco in resultados.items():
+        matC[inicio:inicio + bloco.shape[0]] = bloco
+
+    return matC, tempo_clock, tempo_cpu, tempo_total_comunicacao, tempos_backends
+
+# Divide `total` índices em `partes` faixas contíguas (as primeiras recebem a sobra)
+def faixas(total, partes):
+    base, resto = divmod(total, partes)
+    limites, inicio = [], 0
+    for i in range(partes):
+        fim = inicio + base + (1 if i < resto else 0)
+        limites.append((inicio, fim))
+        inicio = fim
+    return limites
+
+# Grade de processos linhas x colunas para p backends, a mais quadrada possível
+def formar_grade(num_backends):
+    linhas = max(d for d in range(1, int(num_backends ** 0.5) + 1) if num_backends % d == 0)
+    return linhas, num_backends // linhas
+
+# Trabalho de um backend na posição (i, j) da grade SUMMA: a cada rodada envia o
+# painel A[faixa i, painel k] e o painel B[painel k, faixa j]; o backend acumula o
+# seu tile C[i, j]. Ao final busca o tile. O backend nunca guarda A ou B inteiras:
+# memória O(n²/p) e tráfego O(n²/linhas + n²/colunas) por backend.
+def executar_backend_summa(uri, posicao, matA, matB, faixa_linhas, faixa_colunas, paineis,
+                           medidas, rastreador, timeout=None, codec="auto", exato=False):
+    (l0, l1), (c0, c1) = faixa_linhas, faixa_colunas
+    tempos = {"uri": uri, "posicao": posicao, "envio_B": 0.0, "multiplicacao": 0.0, "comunicacao": 0.0,
+              "chunks": 0, "linhas": l1 - l0, "bytes": 0, "B_em_cache": False, "falhou": False,
+              "codec": codec}
+    tile = None
+    with Pyro5.api.Proxy(uri) as p:
+        p._pyroTimeout = timeout
+        p._pyroSerializer = "marshal"
+        sessao_id = p.abrir_sessao()
+        if codec == "auto":
+            codec, banda = escolher_codec_backend(p, medidas, rastreador)
+            tempos["codec"] = codec
+            print(f"\t{uri} {posicao}: banda ~{banda/1024/1024:.1f} MB/s -> codec {codec}")
+        inicio = time.time()
+        p.iniciar_tile_C(l1 - l0, c1 - c0, sessao_id, exato)
+        converter = para_ponto_fixo if exato else np.asarray
+        for k0, k1 in paineis:
+            with rastreador.intervalo("codificar_paineis", painel=k0):
+                painel_A = empacotar(codificar_array(converter(matA[l0:l1, k0:k1])), codec)
+                painel_B = empacotar(codificar_array(converter(matB[k0:k1, c0:c1])), codec)
+            with rastreador.intervalo("chamada", uri=uri, painel=k0,
+                                      bytes=len(painel_A) + len(painel_B)) as chamada:
+                _, spans = p.acumular_paineis(painel_A, painel_B, sessao_id, True)
+            tempos["comunicacao"] += incorporar_spans_servidor(rastreador, spans, chamada, "atendimento")
+            tempos["bytes"] += len(painel_A) + len(painel_B)
+            tempos["chunks"] += 1
+        with rastreador.intervalo("obter_tile_C", uri=uri):
+            dados = p.obter_tile_C(sessao_id, codec)
+        with rastreador.intervalo("decodificar_C"):
+            tile = decodificar_array(desempacotar(dados))
+        tempos["bytes"] += len(dados)
+        tempos["multiplicacao"] = time.time() - inicio
+        p.fechar_sessao(sessao_id)
+    tempos["total"] = tempos["multiplicacao"]
+    print(f"\t{uri} {posicao}: {tempos['chunks']} rodadas, {tempos['bytes']/1024/1024:.1f} MB trafegados")
+    return tile, tempos
+
+# Multiplicação distribuída em grade 2D (SUMMA): os backends formam uma grade
+# linhas x colunas, cada um responsável por um tile de C, e recebem painéis de
+# `painel` colunas de A / linhas de B por rodada. O cliente distribui os painéis
+# (no lugar do broadcast entre processos do SUMMA original). Com `saida`, cada
+# faixa de linhas de C é gravada assim que todos os tiles dela chegam.
+# Não há reatribuição em caso de falha: um backend que cair interrompe o job.
+def multiplicacao_summa(matA, matB, uris_backends, grade=None, painel=256, timeout=None,
+                        saida=None, rastreador=None, codec="auto", exato=False):
+    rastreador = rastreador or Rastreador()
+    if exato:
+        verificar_overflow_entradas(matA, matB)
+    linhas_grade, colunas_grade = grade or formar_grade(len(uris_backends))
+    if linhas_grade * colunas_grade != len(uris_backends):
+        raise ValueError(f"Grade {linhas_grade}x{colunas_grade} não corresponde a {len(uris_backends)} backends.")
+    n_linhas, n_colunas = matA.shape[0], matB.shape[1]
+    faixas_l = faixas(n_linhas, linhas_grade)
+    faixas_c = faixas(n_colunas, colunas_grade)
+    paineis = [(k, min(k + painel, matA.shape[1])) for k in range(0, matA.shape[1], painel)]
+    print(f"\tGrade {linhas_grade}x{colunas_grade}, {len(paineis)} rodadas de painéis de {painel}")
+
+    inicio_clock = time.time()
+    inicio_cpu = time.process_time()
 
-    # Juntar resultados
-    matC = []
-    for bloco in resultados_blocos:
-        matC.extend(bloco)
+    medidas = {}
+    if codec == "auto":
+        with rastreador.intervalo("sonda_codecs"):
+            # amostra de ~512 KB das primeiras linhas de B
+            medidas = medir_codecs(codificar_array(matB[:max(1, 65536 // n_colunas)]))
 
-    return matC, tempo_clock, tempo_cpu, tempo_total_comunicacao
+    with ThreadPoolExecutor(max_workers=len(uris_backends)) as executor:
+        futuros = {}
+        for idx, uri in enumerate(uris_backends):
+            i, j = divmod(idx, colunas_grade)
+            futuros[(i, j)] = executor.submit(executar_backend_summa, uri, (i, j), matA, matB,
+                                              faixas_l[i], faixas_c[j], paineis, medidas,
+                                              rastreador, timeout, codec, exato)
+        tiles, tempos_backends = {}, []
+        matC = None if saida is not None else np.empty((n_linhas, n_colunas),
+                                                       dtype=np.int64 if exato else np.float64)
+        for i in range(linhas_grade):
+            for j in range(colunas_grade):
+                tiles[j], tempos = futuros[(i, j)].result()
+                tempos_backends.append(tempos)
+            l0, l1 = faixas_l[i]
+            if saida is not None:
+                saida.adicionar(l0, np.hstack([tiles[j] for j in range(colunas_grade)]))
+            else:
+                for j, (c0, c1) in enumerate(faixas_c):
+                    matC[l0:l1, c0:c1] = tiles[j]
+
+    tempo_clock = time.time() - inicio_clock
+    tempo_cpu = time.process_time() - inicio_cpu
+    tempo_total_comunicacao = max(t["comunicacao"] for t in tempos_backends)
+    return matC, tempo_clock, tempo_cpu, tempo_total_comunicacao, tempos_backends
 
 def main():
     args = parse_args()
@@ -109,40 +688,108 @@ def main():
     print("NS Host:", ns_host)
     print("Backends:", backends)
 
-    # Resolve backend URIs via NameServer
-    Pyro5.api.locate_ns(host=ns_host)
+    # Resolve backend URIs via NameServer (PYRONAME: é resolvido no mesmo host/porta)
+    Pyro5.config.NS_HOST = ns_host
+    Pyro5.config.NS_PORT = args.ns_port
+    Pyro5.api.locate_ns(host=ns_host, port=args.ns_port)
     
     uris = [f"{be}@{ns_host}" if not be.startswith("PYRONAME:") else be for be in backends]
 
     print("\nCarregando matrizes A e B...")
     matrix_dir = "data"
-    matA = np.loadtxt(f"{matrix_dir}/matA.txt").tolist()
-    matB = np.loadtxt(f"{matrix_dir}/matB.txt").tolist()
-    print("Matrizes carregadas com sucesso!")
+    path_matA = localizar_matriz(matrix_dir, "matA", args.formato)
+    path_matB = localizar_matriz(matrix_dir, "matB", args.formato)
+    path_matC = "data/matC.txt"
+
+    # Mesmo (A, B) já calculado antes com --exato (em qualquer modo): devolve o matC.txt
+    # do cache sem abrir sessões nos backends
+    cache = CacheResultados(args.cache_dir, args.cache_mb) if args.exato and not args.sem_cache else None
+    if cache is not None:
+        chave = cache.chave(path_matA, path_matB)
+        if servir_do_cache(cache, chave, path_matC, args.outdir, "distribuido", len(uris)):
+            return
+
+    # .npy é aberto com memory-map: cada bloco de A só é lido do disco ao ser enviado;
+    # .txt é lido em paralelo
+    rastreador = Rastreador("cliente")
+    with rastreador.intervalo("carga") as carga:
+        matA = carregar_matriz(path_matA)
+        matB = carregar_matriz(path_matB)
+    tempo_carga = carga["duracao"]
+    print(f"Matrizes carregadas com sucesso em {tempo_carga:.3f}s!")
 
     print("\nIniciando multiplicação distribuída...")
-    matC, tempo_clock, tempo_cpu, tempo_com = multiplicacao_distribuida(matA, matB, uris)
-    
-    path_matC = "data/matC.txt"
-    with open(path_matC, "w") as f:
-        for i, linha in enumerate(matC):
-            if i > 0:
-                f.write("\n")
-            f.write(" ".join(f"{valor:.4f}" for valor in linha))
+    pesos = None
+    if args.pesos:
+        hosts = hosts_dos_backends(uris)
+        pesos = calcular_pesos(hosts, ler_gflops_benchmark(args.pesos))
+        for uri, host, peso in zip(uris, hosts, pesos):
+            print(f"\tPeso de {uri} ({host}): {peso:.2f}")
+
+    checkpoint = None
+    if not args.sem_checkpoint and args.modo == "linhas":
+        base = Path(args.checkpoint_dir or f"{args.outdir}/checkpoints")
+        # blocos exatos (int64) e float não podem se misturar na retomada
+        checkpoint = CheckpointBlocos(base / (chave_job(path_matA, path_matB) + ("-exato" if args.exato else "")))
+        print("Checkpoint:", checkpoint.diretorio)
+
+    formatar = formatar_produto if args.exato else formatar_truncado
+    saida = EscritorOrdenado(path_matC, matA.shape[0], formatar) if args.streaming else None
+
+    if args.modo == "summa":
+        grade = tuple(int(x) for x in args.grade.lower().split("x")) if args.grade else None
+        matC, tempo_clock, tempo_cpu, tempo_com, tempos_backends = multiplicacao_summa(
+            matA, matB, uris, grade=grade, painel=args.painel, timeout=args.timeout,
+            saida=saida, rastreador=rastreador, codec=args.codec, exato=args.exato)
+    else:
+        matC, tempo_clock, tempo_cpu, tempo_com, tempos_backends = multiplicacao_distribuida(
+            matA, matB, uris, linhas_por_chunk=args.linhas_chunk, pesos=pesos,
+            timeout=args.timeout, checkpoint=checkpoint, saida=saida, rastreador=rastreador,
+            codec=args.codec, exato=args.exato, profundidade=args.pipeline,
+            linhas_subchunk=args.linhas_subchunk)
+
+    # Grava matC.txt calculando o SHA-256 durante a escrita (sem reler o arquivo)
+    with rastreador.intervalo("escrita_final"):
+        if saida is not None:
+            h = saida.fechar()
+        else:
+            h = escrever_matriz(path_matC, matC, formatar)
+
+    # Job concluído e gravado: os blocos parciais não são mais necessários
+    if checkpoint is not None:
+        checkpoint.limpar()
 
     print("\nMultiplicação finalizada!")
     print(f"Tempo Clock: {tempo_clock:.2f}s")
     print(f"Tempo CPU: {tempo_cpu:.2f}s")
-    print(f"Tempo Comunicação: {tempo_com:.2f}s")
-    
-    h = sha256_of_file(path_matC)
+    print(f"Tempo Comunicação (rede, backend mais lento): {tempo_com:.2f}s")
+    soma_backends = sum(t["total"] for t in tempos_backends)
+    for t in tempos_backends:
+        estado = " [FALHOU]" if t["falhou"] else (" [B em cache]" if t["B_em_cache"] else "")
+        print(f"\t{t['uri']}{estado}: {t['linhas']} linhas em {t['chunks']} chunks | codec {t['codec']} | envio B {t['envio_B']:.2f}s | multiplicação {t['multiplicacao']:.2f}s | comunicação {t['comunicacao']:.2f}s | total {t['total']:.2f}s")
+    if tempo_clock > 0:
+        print(f"Soma dos backends: {soma_backends:.2f}s (ganho da sobreposição: {soma_backends / tempo_clock:.2f}x)")
+    tempo_oculto = max((t.get("comunicacao_oculta", 0.0) for t in tempos_backends), default=0.0)
+    if args.pipeline:
+        print(f"Pipeline (profundidade {args.pipeline}): até {tempo_oculto:.2f}s de transferência "
+              f"escondidos atrás do cálculo por backend")
+
     save_hash(h, f"{args.outdir}/hash.txt")
+    if cache is not None:
+        cache.guardar(chave, path_matC, h)
     
     # Salvar log
     cabecalho = ["modo","num_processos","tempo_clock","tempo_cpu","tempo_comunicacao","tempo_total","timestamp","notas"]
-    linha_log = ["paralelo_local", 2, f"{tempo_clock:.6f}", f"{tempo_cpu:.6f}", 0.0, f"{tempo_clock:.6f}", agora_ts(), ""]
+    timestamp = agora_ts()
+    linha_log = ["distribuido", len(uris), f"{tempo_clock:.6f}", f"{tempo_cpu:.6f}", f"{tempo_com:.6f}", f"{tempo_clock:.6f}", timestamp, formatar_notas(carga=f"{tempo_carga:.3f}", dims=f"{matA.shape[0]}x{matA.shape[1]}x{matB.shape[1]}", modo=args.modo, exato=int(args.exato), codec=",".join(sorted({t["codec"] for t in tempos_backends})), pipeline=args.pipeline, com_oculta=f"{tempo_oculto:.6f}", cache="off" if cache is None else "miss")]
     adicionar_log(f"{args.outdir}/run_logs.csv", linha_log, cabecalho)
 
+    # Linha do tempo (Chrome trace) e resumo por fase de cliente e backends
+    path_trace = args.trace or f"{args.outdir}/trace.json"
+    rastreador.exportar_chrome(path_trace)
+    rastreador.exportar_resumo(f"{args.outdir}/trace_resumo.csv", timestamp)
+    print(f"Trace salvo em {path_trace} (resumo em {args.outdir}/trace_resumo.csv)")
+
     print("\nResultado salvo em matC.txt")
 
 if __name__ == "__main__":
@@ -1,104 +1,456 @@
 import argparse
+import socket
 import Pyro5.api
-from pathlib import Path
-from benchmark import run_benchmark
 import time
-from numba import njit
-import gzip, pickle
-from Pyro5.api import SerializedBlob
-import base64
-from numba.typed import List
-
-@njit(cache=True, fastmath=True)
-def multiplicar_numba(A, B):
-    # Multiplicação de matrizes A e B usando Numba para acelerar
-    num_linhas = len(A)
-    num_colunas = len(B[0])
-    num_elem = len(B)
-
-    # pré-aloca resultado como lista de listas
-    resultado = [[0.0 for _ in range(num_colunas)] for _ in range(num_linhas)]
-
-    #Calcula as dimensões e prepara a matriz resultado
-    #Percorre as linhas de A e as colunas de B. 
-    for i in range(num_linhas):
-        for j in range(num_colunas):
-            soma = 0.0
-            for k in range(num_elem):
-                soma += A[i][k] * B[k][j]
-            resultado[i][j] = soma
-        print(f"  Linha {i+1}/{num_linhas} processada.")
-    return resultado
-
-#Conversão para o Numba (ele não aceita listas Python normais)
-def to_typed_2d(py2d):
-    out = List()
-    for row in py2d:
-        r = List()
-        for v in row:
-            r.append(float(v))
-        out.append(r)
-    return out
+import os
+import numpy as np
+from utils.wire import codificar_array, decodificar_array, para_bytes
+from utils.kernels import KERNELS, definir_threads, threads_blas
+from utils.hash_check import sha256_of_bytes
+from utils.timer import Rastreador
+from utils.compressao import codecs_disponiveis, desempacotar, empacotar
+from collections import OrderedDict
+import threading
+import queue
+import uuid
+
+#Multiplica A por B em faixas de linhas, chamando o kernel escolhido em cada faixa,
+#e imprime o progresso no máximo uma vez a cada `intervalo` segundos.
+#A faixa é grande o bastante para ocupar todas as threads do kernel.
+def multiplicar_com_progresso(A, B, kernel, bloco, linhas_faixa, intervalo, nome):
+    num_linhas = A.shape[0]
+    if num_linhas <= linhas_faixa:
+        return KERNELS[kernel](A, B, bloco)
+    C = np.empty((num_linhas, B.shape[1]), dtype=np.result_type(A, B))
+    ultimo = time.time()
+    for i0 in range(0, num_linhas, linhas_faixa):
+        i1 = min(i0 + linhas_faixa, num_linhas)
+        C[i0:i1] = KERNELS[kernel](A[i0:i1], B, bloco)
+        agora = time.time()
+        if agora - ultimo >= intervalo:
+            print(f"  [{nome}] {i1}/{num_linhas} linhas processadas.")
+            ultimo = agora
+    return C
+
+#Estado de um job (sessão): cada cliente tem sua própria B e seus próprios
+#contadores, então jobs concorrentes no mesmo backend não se sobrescrevem
+class Sessao:
+    def __init__(self, sessao_id):
+        self.id = sessao_id
+        self.hash_B = None
+        self.ultimo_acesso = time.time()
+        self.em_uso = 0
+        self.chunks = 0
+        self.linhas_processadas = 0
+        self.tempo_kernel = 0.0
+        #Modo SUMMA: tile de C acumulado painel a painel (a sessão não usa B inteira)
+        self.tile_C = None
+        #Protocolo em pipeline (PipelineSessao), quando o cliente o inicia
+        self.pipeline = None
+
+    def estado(self):
+        return {
+            "sessao": self.id,
+            "hash_B": self.hash_B,
+            "chunks": self.chunks,
+            "linhas_processadas": self.linhas_processadas,
+            "tempo_kernel": self.tempo_kernel,
+        }
+
+#Pipeline de sub-chunks de uma sessão: enviar_subchunk só enfileira o bloco de A e
+#retorna, uma thread de cálculo da sessão consome a fila e guarda o resultado até
+#receber_subchunk buscá-lo. Com `profundidade` sub-chunks em voo, o envio do k+1,
+#o cálculo do k e o retorno do k-1 acontecem ao mesmo tempo.
+class PipelineSessao:
+    def __init__(self, profundidade, codec_C):
+        self.entrada = queue.Queue(maxsize=profundidade)
+        self.resultados = {}
+        self.cond = threading.Condition()
+        self.codec_C = codec_C
+        self.ativo = True
+        self.thread = None
+
+    def encerrar(self):
+        self.ativo = False
+        if self.thread is not None:
+            self.thread.join()
 
 @Pyro5.api.expose
 class CalculadoraMatriz(object):
     #Inicializando o servidor
-    def __init__(self):
-            self.matriz_B = None
+    def __init__(self, kernel="numba-paralelo", bloco=64, threads=1, intervalo_progresso=2.0,
+                 max_cache_B=4, memoria_max=None, sessao_ttl=600.0):
+            #Cache LRU de matrizes B já recebidas, indexado pelo SHA-256 do buffer.
+            #As sessões apontam para entradas do cache; entradas em uso não são descartadas.
+            self.cache_B = OrderedDict()
+            self.max_cache_B = max_cache_B
+            self.memoria_max = memoria_max
+            self.sessoes = {}
+            self.sessao_ttl = sessao_ttl
+            #As chamadas chegam em paralelo pelo pool de threads do Pyro5: o lock
+            #protege sessões e cache; o kernel já usa todos os núcleos, então as
+            #multiplicações de sessões diferentes são executadas uma de cada vez
+            self.lock = threading.RLock()
+            self.lock_kernel = threading.Lock()
             self.nome = "Servidor"
+            self.kernel = kernel
+            self.bloco = bloco
+            self.threads = threads
+            self.intervalo_progresso = intervalo_progresso
 
     def set_nome(self, nome):
         self.nome = nome
 
-    @Pyro5.api.expose
-    #Recebe a matriz B comprimida
-    def set_matriz_B_compressa(self, dados_zip):
-        # Normalmente já será bytes por causa do SERIALIZER="pickle"
-        #Faz a decodificação aceitando bytes e dicionários 
-        if isinstance(dados_zip, (bytes, bytearray)):
-            raw = dados_zip
-        elif isinstance(dados_zip, dict):  
-            if "data" in dados_zip:
-                raw = base64.b64decode(dados_zip["data"])
-            elif "py/b64" in dados_zip:
-                raw = base64.b64decode(dados_zip["py/b64"])
-            else:
-                raise TypeError(f"Dict inesperado: chaves={list(dados_zip.keys())}")
-        else:
-            raise TypeError(f"Esperado bytes, recebi: {type(dados_zip)}")
-
-       #Descompacta e desserializa a matriz B
-        print(f"[{self.nome}] Recebendo matriz B comprimida: {len(raw)/1024/1024:.2f} MB")
-        dados = gzip.decompress(raw)
-        B_py = pickle.loads(dados)          # lista de listas “normal” (Python)
-        self.matriz_B = B_py               
-        self.matriz_B_nb = to_typed_2d(B_py)  # versão tipada p/ Numba
-        print(f"[{self.nome}] B descomprimida! Dim: {len(B_py)} x {len(B_py[0])}")
-        return True #confirmado
-
-    def set_matriz_B(self, matriz_B):
-        print(f"[{self.nome}] Matriz B recebida! Dimensões: {len(matriz_B)} x {len(matriz_B[0])}")
-        self.matriz_B = matriz_B
+    #Hostname da máquina, usado pelo cliente para buscar os GFLOPS no benchmarks.csv
+    def get_host(self):
+        return socket.gethostname()
+
+    #Codecs de compressão instalados neste servidor (o cliente só usa os que os dois têm)
+    def codecs_disponiveis(self):
+        return codecs_disponiveis()
+
+    #Chamada de sonda: o cliente mede a latência e a banda do enlace pelo tempo de ida e volta
+    def sonda(self, dados):
+        return len(para_bytes(dados))
+
+    #Abre um job novo e retorna seu id; o cliente passa esse id nas demais chamadas
+    def abrir_sessao(self):
+        with self.lock:
+            self._expirar_sessoes()
+            sessao_id = uuid.uuid4().hex
+            self.sessoes[sessao_id] = Sessao(sessao_id)
+        print(f"[{self.nome}] Sessão {sessao_id[:8]} aberta ({len(self.sessoes)} ativas)")
+        return sessao_id
+
+    def fechar_sessao(self, sessao_id):
+        with self.lock:
+            sessao = self.sessoes.pop(sessao_id, None)
+            self._liberar_memoria(0)
+        if sessao is None:
+            return None
+        if sessao.pipeline is not None:
+            sessao.pipeline.encerrar()
+        print(f"[{self.nome}] Sessão {sessao_id[:8]} fechada: {sessao.linhas_processadas} linhas")
+        return sessao.estado()
+
+    def estado_sessao(self, sessao_id=None):
+        with self.lock:
+            return self._sessao(sessao_id).estado()
+
+    def _sessao(self, sessao_id):
+        #Sem id usa a sessão "padrao" (compatível com clientes de um único job)
+        if sessao_id is None:
+            sessao_id = "padrao"
+            if sessao_id not in self.sessoes:
+                self.sessoes[sessao_id] = Sessao(sessao_id)
+        if sessao_id not in self.sessoes:
+            raise KeyError(f"Sessão {sessao_id} não existe (expirada ou já fechada).")
+        sessao = self.sessoes[sessao_id]
+        sessao.ultimo_acesso = time.time()
+        return sessao
+
+    def _expirar_sessoes(self):
+        #Descarta sessões ociosas há mais de sessao_ttl segundos
+        agora = time.time()
+        for sessao_id, sessao in list(self.sessoes.items()):
+            if sessao.em_uso == 0 and agora - sessao.ultimo_acesso > self.sessao_ttl:
+                print(f"[{self.nome}] Sessão {sessao_id[:8]} expirada por inatividade")
+                if sessao.pipeline is not None:
+                    sessao.pipeline.ativo = False
+                del self.sessoes[sessao_id]
+
+    def _kernel_para(self, A, B):
+        #Matrizes int64 (modo exato, ponto fixo) sempre usam o kernel inteiro
+        if A.dtype.kind == "i" or B.dtype.kind == "i":
+            if A.dtype.kind != B.dtype.kind:
+                raise TypeError(f"A ({A.dtype}) e B ({B.dtype}) precisam ser ambas exatas ou ambas float.")
+            return "inteiro"
+        return self.kernel
+
+    def _memoria_em_uso(self):
+        tiles = sum(s.tile_C.nbytes for s in self.sessoes.values() if s.tile_C is not None)
+        return sum(B.nbytes for B in self.cache_B.values()) + tiles
+
+    def _liberar_memoria(self, necessario):
+        #Remove do cache as B que nenhuma sessão usa (da menos recente para a mais
+        #recente) até respeitar o tamanho do cache e o limite de memória
+        self._expirar_sessoes()
+        em_uso = {s.hash_B for s in self.sessoes.values()}
+        livres = [h for h in self.cache_B if h not in em_uso]
+        def excede():
+            if len(self.cache_B) - len(em_uso & set(self.cache_B)) > self.max_cache_B:
+                return True
+            return self.memoria_max is not None and self._memoria_em_uso() + necessario > self.memoria_max
+        while livres and excede():
+            del self.cache_B[livres.pop(0)]
+        if self.memoria_max is not None and self._memoria_em_uso() + necessario > self.memoria_max:
+            raise MemoryError(f"Limite de memória do servidor atingido "
+                              f"({self.memoria_max/1024/1024:.0f} MB) por B em uso em outras sessões.")
+
+    #Pergunta do cliente: "você já tem a B com este hash?"
+    #Em caso positivo a B do cache passa a ser a B da sessão e o envio é dispensado.
+    def tem_matriz_B(self, hash_B, sessao_id=None):
+        with self.lock:
+            sessao = self._sessao(sessao_id)
+            if hash_B not in self.cache_B:
+                return False
+            self.cache_B.move_to_end(hash_B)
+            sessao.hash_B = hash_B
+        print(f"[{self.nome}] B {hash_B[:12]}... encontrada no cache")
+        return True
+
+    def _guardar_B(self, dados, hash_B=None, sessao_id=None, rastreador=None):
+        #Confere o hash informado pelo cliente e guarda B no cache da sessão
+        rastreador = rastreador or Rastreador(self.nome)
+        with rastreador.intervalo("hash_B"):
+            hash_real = sha256_of_bytes(dados)
+        if hash_B is not None and hash_B != hash_real:
+            raise ValueError(f"Hash de B não confere: esperado {hash_B}, recebido {hash_real}")
+        with rastreador.intervalo("decodificar_B"):
+            B = decodificar_array(dados)
+        with self.lock:
+            sessao = self._sessao(sessao_id)
+            sessao.hash_B = None
+            if hash_real not in self.cache_B:
+                self._liberar_memoria(B.nbytes)
+            self.cache_B[hash_real] = B
+            self.cache_B.move_to_end(hash_real)
+            sessao.hash_B = hash_real
+            self._liberar_memoria(0)
+        return B
+
+    #Recebe a matriz B comprimida com qualquer codec de utils.compressao
+    #(o hash é o do buffer de wire.codificar_array, antes da compressão)
+    def set_matriz_B_codificada(self, pacote, hash_B=None, sessao_id=None, rastrear=False):
+        rastreador = Rastreador(self.nome)
+        with rastreador.intervalo("atendimento_B"):
+            raw = para_bytes(pacote)
+            print(f"[{self.nome}] Recebendo matriz B: {len(raw)/1024/1024:.2f} MB")
+            with rastreador.intervalo("descompressao_B", bytes=len(raw)):
+                dados = desempacotar(raw)
+            B = self._guardar_B(dados, hash_B, sessao_id, rastreador)
+        print(f"[{self.nome}] Matriz B recebida! Dim: {B.shape[0]} x {B.shape[1]}")
+        if rastrear:
+            return True, rastreador.spans
+        return True
+
+    #Recebe a matriz B sem compressão (buffer binário de wire.codificar_array)
+    def set_matriz_B(self, dados, hash_B=None, sessao_id=None, rastrear=False):
+        rastreador = Rastreador(self.nome)
+        with rastreador.intervalo("atendimento_B"):
+            B = self._guardar_B(para_bytes(dados), hash_B, sessao_id, rastreador)
+        print(f"[{self.nome}] Matriz B recebida! Dimensões: {B.shape[0]} x {B.shape[1]}")
+        if rastrear:
+            return True, rastreador.spans
         return True
 
-    #Principal método remoto: recebe um bloco de linhas da A, multiplica por B e retorna o resultado parcial. 
-    def multiplicar_linhas(self, linhas_A):
-        if getattr(self, "matriz_B_nb", None) is None:
-            raise RuntimeError("Matriz B não foi definida ainda.")
+    #Principal método remoto: recebe um bloco de linhas da A, multiplica pela B da
+    #sessão e retorna o resultado parcial.
+    #Entrada e saída são buffers binários (wire.codificar_array), opcionalmente
+    #comprimidos (utils.compressao); codec_C é o codec usado no resultado.
+    #Com rastrear=True retorna (C, spans): as fases medidas neste servidor
+    #(decodificação, espera pelo kernel, kernel e codificação do resultado).
+    def multiplicar_linhas(self, linhas_A, sessao_id=None, rastrear=False, codec_C="nenhum"):
+        rastreador = Rastreador(self.nome)
+        with rastreador.intervalo("atendimento"):
+            with self.lock:
+                sessao = self._sessao(sessao_id)
+            dados = self._multiplicar_bloco(sessao, para_bytes(linhas_A), codec_C, rastreador)
 
-        print(f"\n[{self.nome}] Recebido bloco com {len(linhas_A)} linhas de A para multiplicar...")
-        inicio = time.time()
+        if rastrear:
+            return dados, rastreador.spans
+        return dados
 
-        A_nb = to_typed_2d(linhas_A)        
-        print(f"[{self.nome}] Bloco A convertido para typed.List para Numba.")
-        C_nb = multiplicar_numba(A_nb, self.matriz_B_nb)
+    def _multiplicar_bloco(self, sessao, dados_A, codec_C, rastreador):
+        #Multiplica um bloco de A (buffer recebido) pela B da sessão e devolve o
+        #buffer de C; usado por multiplicar_linhas e pela thread do pipeline
+        with self.lock:
+            if sessao.hash_B is None:
+                raise RuntimeError("Matriz B não foi definida ainda.")
+            B = self.cache_B[sessao.hash_B]
+            sessao.em_uso += 1
 
-        fim = time.time()
-        print(f"[{self.nome}] Bloco multiplicado com Numba! Tempo: {fim - inicio:.3f}s ✅\n")
+        try:
+            with rastreador.intervalo("descompressao_A"):
+                dados_A = desempacotar(dados_A)
+            with rastreador.intervalo("decodificar_A"):
+                A = decodificar_array(dados_A)
+            print(f"\n[{self.nome}] Recebido bloco com {A.shape[0]} linhas de A para multiplicar...")
+            with rastreador.intervalo("espera_kernel"):
+                self.lock_kernel.acquire()
+            try:
+                kernel = self._kernel_para(A, B)
+                with rastreador.intervalo("kernel", linhas=A.shape[0], kernel=kernel):
+                    inicio = time.time()
+                    C = multiplicar_com_progresso(A, B, kernel, self.bloco,
+                                                  self.bloco * self.threads * 4,
+                                                  self.intervalo_progresso, self.nome)
+                    fim = time.time()
+            finally:
+                self.lock_kernel.release()
+            print(f"[{self.nome}] Bloco multiplicado ({kernel})! Tempo: {fim - inicio:.3f}s ✅\n")
+        finally:
+            with self.lock:
+                sessao.em_uso -= 1
+                sessao.ultimo_acesso = time.time()
 
-        # Converte o bloco A para lista de listas normal para retornar via Pyro
-        C_py = [list(row) for row in C_nb]
-        return C_py
+        with self.lock:
+            sessao.chunks += 1
+            sessao.linhas_processadas += A.shape[0]
+            sessao.tempo_kernel += fim - inicio
+
+        with rastreador.intervalo("codificar_C"):
+            dados = codificar_array(C)
+        with rastreador.intervalo("compressao_C", codec=codec_C):
+            return empacotar(dados, codec_C)
+
+    #Protocolo em pipeline (transferência sobreposta ao cálculo): o cliente inicia o
+    #pipeline da sessão, envia sub-chunks de A com enviar_subchunk (que retorna assim
+    #que o bloco entra na fila) e busca cada resultado com receber_subchunk.
+    #A fila tem `profundidade` posições: um cliente que envia mais rápido do que o
+    #backend calcula fica bloqueado no envio, e a memória do servidor fica limitada.
+    def iniciar_pipeline(self, sessao_id=None, profundidade=2, codec_C="nenhum"):
+        with self.lock:
+            sessao = self._sessao(sessao_id)
+            if sessao.hash_B is None:
+                raise RuntimeError("Matriz B não foi definida ainda.")
+            if sessao.pipeline is not None:
+                raise RuntimeError("O pipeline desta sessão já foi iniciado.")
+            pipeline = PipelineSessao(max(1, profundidade), codec_C)
+            sessao.pipeline = pipeline
+        pipeline.thread = threading.Thread(target=self._calcular_pipeline, args=(sessao, pipeline),
+                                           name=f"calculo-{sessao.id[:8]}", daemon=True)
+        pipeline.thread.start()
+        print(f"[{self.nome}] Pipeline da sessão {sessao.id[:8]} iniciado (profundidade {profundidade})")
+        return True
+
+    def _calcular_pipeline(self, sessao, pipeline):
+        #Thread de cálculo: consome os sub-chunks na ordem de chegada até o pipeline
+        #ser encerrado; um erro vira o resultado do sub-chunk e chega ao cliente
+        while pipeline.ativo:
+            try:
+                seq, dados_A = pipeline.entrada.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            rastreador = Rastreador(self.nome)
+            try:
+                with rastreador.intervalo("processamento", seq=seq):
+                    resultado = self._multiplicar_bloco(sessao, dados_A, pipeline.codec_C, rastreador)
+            except Exception as e:
+                resultado = e
+            with pipeline.cond:
+                pipeline.resultados[seq] = (resultado, rastreador.spans)
+                pipeline.cond.notify_all()
+
+    def _pipeline(self, sessao_id):
+        with self.lock:
+            sessao = self._sessao(sessao_id)
+            if sessao.pipeline is None:
+                raise RuntimeError("Pipeline não foi iniciado (iniciar_pipeline).")
+            return sessao.pipeline
+
+    def enviar_subchunk(self, seq, linhas_A, sessao_id=None, rastrear=False):
+        rastreador = Rastreador(self.nome)
+        with rastreador.intervalo("atendimento_envio", seq=seq):
+            pipeline = self._pipeline(sessao_id)
+            dados_A = para_bytes(linhas_A)
+            with rastreador.intervalo("espera_fila", seq=seq):
+                pipeline.entrada.put((seq, dados_A))
+        if rastrear:
+            return True, rastreador.spans
+        return True
+
+    #Espera o resultado do sub-chunk `seq`; com rastrear=True os spans incluem as
+    #fases do cálculo feitas na thread do pipeline
+    def receber_subchunk(self, seq, sessao_id=None, rastrear=False):
+        rastreador = Rastreador(self.nome)
+        with rastreador.intervalo("atendimento_recebimento", seq=seq):
+            pipeline = self._pipeline(sessao_id)
+            with pipeline.cond:
+                while seq not in pipeline.resultados:
+                    if not pipeline.thread.is_alive():
+                        raise RuntimeError("A thread de cálculo do pipeline foi encerrada.")
+                    pipeline.cond.wait(0.5)
+                resultado, spans = pipeline.resultados.pop(seq)
+        if isinstance(resultado, Exception):
+            raise resultado
+        if rastrear:
+            return resultado, spans + rastreador.spans
+        return resultado
+
+    def encerrar_pipeline(self, sessao_id=None):
+        with self.lock:
+            sessao = self._sessao(sessao_id)
+            pipeline, sessao.pipeline = sessao.pipeline, None
+        if pipeline is not None:
+            pipeline.encerrar()
+        return True
+
+    #Modo SUMMA (grade 2D de backends): cada backend guarda apenas o seu tile de C.
+    #A cada rodada k o cliente envia o painel A[i, k] e o painel B[k, j] e o backend
+    #acumula C[i, j] += A[i, k] @ B[k, j], então nem A nem B inteiras ficam no servidor.
+    #exato=True acumula em int64 (ponto fixo, painéis int64)
+    def iniciar_tile_C(self, linhas, colunas, sessao_id=None, exato=False):
+        with self.lock:
+            sessao = self._sessao(sessao_id)
+            sessao.tile_C = None
+            self._liberar_memoria(linhas * colunas * 8)
+            sessao.tile_C = np.zeros((linhas, colunas), dtype=np.int64 if exato else np.float64)
+        print(f"[{self.nome}] Tile de C {linhas} x {colunas} alocado (sessão {str(sessao_id)[:8]})")
+        return True
+
+    def acumular_paineis(self, painel_A, painel_B, sessao_id=None, rastrear=False):
+        rastreador = Rastreador(self.nome)
+        with rastreador.intervalo("atendimento"):
+            with self.lock:
+                sessao = self._sessao(sessao_id)
+                if sessao.tile_C is None:
+                    raise RuntimeError("Tile de C não foi iniciado (iniciar_tile_C).")
+                sessao.em_uso += 1
+            try:
+                with rastreador.intervalo("descompressao_A"):
+                    dados_A = desempacotar(para_bytes(painel_A))
+                with rastreador.intervalo("descompressao_B"):
+                    dados_B = desempacotar(para_bytes(painel_B))
+                with rastreador.intervalo("decodificar_A"):
+                    A = decodificar_array(dados_A)
+                with rastreador.intervalo("decodificar_B"):
+                    B = decodificar_array(dados_B)
+                with rastreador.intervalo("espera_kernel"):
+                    self.lock_kernel.acquire()
+                try:
+                    kernel = self._kernel_para(A, B)
+                    if (kernel == "inteiro") != (sessao.tile_C.dtype.kind == "i"):
+                        raise TypeError("Painéis e tile de C precisam ser ambos exatos ou ambos float.")
+                    with rastreador.intervalo("kernel", linhas=A.shape[0], painel=A.shape[1], kernel=kernel):
+                        inicio = time.time()
+                        sessao.tile_C += KERNELS[kernel](A, B, self.bloco)
+                        fim = time.time()
+                finally:
+                    self.lock_kernel.release()
+            finally:
+                with self.lock:
+                    sessao.em_uso -= 1
+                    sessao.ultimo_acesso = time.time()
+
+            with self.lock:
+                sessao.chunks += 1
+                sessao.tempo_kernel += fim - inicio
+
+        if rastrear:
+            return True, rastreador.spans
+        return True
+
+    #Retorna o tile de C acumulado (opcionalmente comprimido) e o libera da memória
+    def obter_tile_C(self, sessao_id=None, codec="nenhum"):
+        with self.lock:
+            sessao = self._sessao(sessao_id)
+            C, sessao.tile_C = sessao.tile_C, None
+        if C is None:
+            raise RuntimeError("Tile de C não foi iniciado (iniciar_tile_C).")
+        sessao.linhas_processadas += C.shape[0]
+        print(f"[{self.nome}] Tile de C {C.shape[0]} x {C.shape[1]} devolvido após {sessao.chunks} rodadas")
+        return empacotar(codificar_array(C), codec)
 
 
 def main():
@@ -109,22 +461,51 @@ def main():
     parser.add_argument("--port", type=int, default=0, help="porta do daemon (0=auto)")
     parser.add_argument("--name", required=True, help="nome Pyro para registrar (único por servidor)")
     parser.add_argument("--ns-host", default="192.168.1.7", help="host do nameserver Pyro (se houver)")
+    parser.add_argument("--ns-port", type=int, default=Pyro5.config.NS_PORT, help="porta do nameserver Pyro")
+    parser.add_argument("--kernel", choices=sorted(k for k in KERNELS if k != "inteiro"),
+                        default="numba-paralelo",
+                        help="kernel de multiplicação float (default: numba-paralelo); "
+                             "blocos int64 do modo exato sempre usam o kernel inteiro")
+    parser.add_argument("--threads", type=int, default=os.cpu_count(),
+                        help="threads do kernel (default: todos os núcleos)")
+    parser.add_argument("--bloco", type=int, default=64, help="tamanho do tile do kernel numba-paralelo")
+    parser.add_argument("--progresso", type=float, default=2.0,
+                        help="intervalo mínimo (s) entre mensagens de progresso")
+    parser.add_argument("--cache-b", type=int, default=4,
+                        help="quantas matrizes B sem sessão ativa manter no cache LRU (0 desativa)")
+    parser.add_argument("--memoria-mb", type=float, default=None,
+                        help="limite de memória (MB) para as matrizes B de todas as sessões")
+    parser.add_argument("--sessao-ttl", type=float, default=600.0,
+                        help="segundos de inatividade até uma sessão ser descartada")
+    parser.add_argument("--max-conexoes", type=int, default=Pyro5.config.THREADPOOL_SIZE,
+                        help="tamanho do pool de threads do Pyro5 (conexões simultâneas)")
     args = parser.parse_args()
 
+    #Servidor multi-thread: cada conexão de cliente é atendida por uma thread do pool
+    Pyro5.config.SERVERTYPE = "thread"
+    Pyro5.config.THREADPOOL_SIZE = args.max_conexoes
+
+    threads = definir_threads(args.threads)
+    print(f"Kernel: {args.kernel} | threads: {threads} | threads da BLAS: {threads_blas()}")
+
     daemon = Pyro5.api.Daemon(host=args.host, port=args.port)
 
-    serv = CalculadoraMatriz()
+    serv = CalculadoraMatriz(kernel=args.kernel, bloco=args.bloco, threads=threads,
+                             intervalo_progresso=args.progresso, max_cache_B=args.cache_b,
+                             memoria_max=args.memoria_mb * 1024 * 1024 if args.memoria_mb else None,
+                             sessao_ttl=args.sessao_ttl)
     serv.set_nome(args.name)
 
+    #O objectId é o próprio nome: URI previsível PYRO:<nome>@<host>:<porta>, com ou sem NS
+    uri = daemon.register(serv, objectId=args.name)
+
     #Registro do nameServer para ser visto pelo client. 
     if args.ns_host:
-        print(f"Conectando ao nameserver em {args.ns_host}...")
-        ns = Pyro5.api.locate_ns(host=args.ns_host)
-        uri = daemon.register(serv)
+        print(f"Conectando ao nameserver em {args.ns_host}:{args.ns_port}...")
+        ns = Pyro5.api.locate_ns(host=args.ns_host, port=args.ns_port)
         ns.register(args.name, uri)
         print(f"[{args.name}] Registrado -> {uri}")
     else:
-        uri = daemon.register(serv)
         print(f"[{args.name}] Registrado sem NS -> {uri}")
 
     print(f"[{args.name}] Servidor pronto! Endereço: {daemon.locationStr}\n")
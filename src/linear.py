@@ -1,79 +1,62 @@
 import argparse
 from pathlib import Path
-from src.utils.hash_check import sha256_of_file, save_hash
-from src.utils.timer import TemporizadorSimples, adicionar_log, agora_ts
-from benchmark import run_benchmark
-
-def truncar_4digitos(matriz):
-    # Trunca valores da matriz para 4 casas decimais sem arredondar
-    matriz_truncada = []
-    for linha in matriz:
-        nova_linha = [int(valor * 10000) / 10000 for valor in linha]
-        matriz_truncada.append(nova_linha)
-    return matriz_truncada
-
-def multiplicacao_linear_for(matA, matB):
-    # Multiplicação de matrizes usando loops for
-    num_linhas = len(matA)
-    num_colunas = len(matB[0])
-    num_elem = len(matB)
-    resultado = [[0.0 for _ in range(num_colunas)] for _ in range(num_linhas)]
-    for i in range(num_linhas): 
-        for j in range(num_colunas):
-            for k in range(num_elem):
-                resultado[i][j] += matA[i][k] * matB[k][j]
-    return resultado
+from src.utils.timer import TemporizadorSimples
+from src.utils.matrix_io import FORMATOS, carregar_matriz, localizar_matriz
+from src.utils.cache_resultados import CacheResultados, servir_do_cache
+from src.utils.engines import adicionar_argumentos_engine, executar_engines, validar_engines
 
 def main():
-    run_benchmark() # Executa benchmark para registrar o resultado no csv. 
     parser = argparse.ArgumentParser()
     parser.add_argument("--matdir", default="data", help="Diretório das matrizes")
     parser.add_argument("--outdir", default="results", help="Diretório de saída")
+    parser.add_argument("--formato", choices=FORMATOS, default="auto",
+                        help="Formato das matrizes de entrada (auto: .npy se existir, senão .txt)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Executa o benchmark.py antes (registra o host em results/benchmarks.csv)")
+    parser.add_argument("--exato", action="store_true",
+                        help="Multiplicação exata em ponto fixo (entradas com 4 casas): mesmo hash "
+                             "que os modos paralelo local e distribuído com --exato")
+    parser.add_argument("--sem-cache", "--no-cache", dest="sem_cache", action="store_true",
+                        help="Recalcula mesmo se o resultado deste (A, B) já estiver no cache (só --exato)")
+    parser.add_argument("--cache-dir", default="results/cache", help="Diretório do cache de resultados")
+    parser.add_argument("--cache-mb", type=float, default=2048, help="Tamanho máximo do cache (MB, LRU)")
+    adicionar_argumentos_engine(parser, "python", 1,
+                                "Threads ou processos das engines paralelas (default: 1)")
     args = parser.parse_args()
+    validar_engines(parser, args)
 
-    Path(args.outdir).mkdir(parents=True, exist_ok=True)
-
-    # Carregar matrizes
-    matA = []
-    matB = []
-    
-    #Inicializa listas para armazenar as matrizes
-    #Converte elas em lista de floats
-    with open(f"{args.matdir}/matA_linear.txt", "r") as f:
-        for linha in f:
-            matA.append([float(x) for x in linha.strip().split()])
-    with open(f"{args.matdir}/matB_linear.txt", "r") as f:
-        for linha in f:
-            matB.append([float(x) for x in linha.strip().split()])
-
-    # Multiplicação linear e medição de tempo
-    temporizador = TemporizadorSimples()
-    temporizador.iniciar()
-    matC = multiplicacao_linear_for(matA, matB)
-    tempo_clock, tempo_cpu = temporizador.parar()
+    if args.benchmark:
+        from benchmark import run_benchmark # importado só quando pedido
+        run_benchmark() # Executa benchmark para registrar o resultado no csv.
 
-    matC = truncar_4digitos(matC)
-
-    # Salvar matriz C
+    Path(args.outdir).mkdir(parents=True, exist_ok=True)
+    path_matA = localizar_matriz(args.matdir, "matA_linear", args.formato)
+    path_matB = localizar_matriz(args.matdir, "matB_linear", args.formato)
     path_matC = f"{args.outdir}/matC.txt"
-    with open(path_matC, "w", encoding="utf8", newline="\n") as f:
-        for i, linha in enumerate(matC):
-            f.write(" ".join(f"{valor:.4f}" for valor in linha))
-            if i != len(matC) - 1:  # só quebra linha se NÃO for a última
-                f.write("\n")
-
-    # Calcular hash e salvar
-    h = sha256_of_file(path_matC)
-    save_hash(h, f"{args.outdir}/hash.txt")
-
-    # Salvar log no csv
-    cabecalho = ["modo","num_processos","tempo_clock","tempo_cpu","tempo_comunicacao","tempo_total","timestamp","notas"]
-    linha_log = ["linear", 1, f"{tempo_clock:.6f}", f"{tempo_cpu:.6f}", 0.0, f"{tempo_clock:.6f}", agora_ts(), ""]
-    adicionar_log(f"{args.outdir}/run_logs.csv", linha_log, cabecalho)
 
+    # Mesmo (A, B) já calculado antes com --exato: devolve o matC.txt guardado no cache.
+    # Comparando várias engines o cache não é consultado (cada uma precisa calcular).
+    cache = CacheResultados(args.cache_dir, args.cache_mb) if args.exato and not args.sem_cache else None
+    chave = None
+    if cache is not None:
+        chave = cache.chave(path_matA, path_matB)
+        if len(args.engine) == 1 and servir_do_cache(cache, chave, path_matC, args.outdir, "linear", 1):
+            return
+
+    # Carregar matrizes (tempo de carga medido à parte, fora do tempo_clock).
+    # A conversão para ponto fixo (--exato) e para listas (laços Python puros) é feita
+    # por engine, também fora do tempo_clock.
+    temporizador_carga = TemporizadorSimples()
+    temporizador_carga.iniciar()
+    matA = carregar_matriz(path_matA)
+    matB = carregar_matriz(path_matB)
+    tempo_carga, _ = temporizador_carga.parar()
+    print(f"Matrizes carregadas em {tempo_carga:.3f}s")
+
+    # Multiplicação com cada engine pedida e medição de tempo
+    executar_engines(args, matA, matB, "linear", {"processos": args.threads, "threads": args.threads},
+                     path_matC, tempo_carga, cache, chave)
     print("Multiplicação Linear concluída.")
-    print("Tempo (clock):", tempo_clock, "CPU:", tempo_cpu)
-    print("Hash:", h)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,221 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+import Pyro5.api
+import Pyro5.errors
+
+# Cluster local para testes de escalabilidade numa única máquina.
+# Sobe um nameserver Pyro5 e N backends (distributed_server.py) em localhost,
+# cada um fixado (sched_setaffinity) num conjunto próprio de núcleos, espera
+# todos ficarem prontos, roda o distributed_client.py com os argumentos dados
+# e encerra tudo ao final, mesmo com erro ou Ctrl+C.
+#
+#   python src/local_cluster.py --backends 4 -- --linhas-chunk 128 --pipeline 2
+#
+# Também pode ser usado como context manager (ex.: scaling_benchmark.py):
+#
+#   with ClusterLocal(2) as cluster:
+#       multiplicacao_distribuida(A, B, cluster.uris)
+
+DIRETORIO = Path(__file__).resolve().parent
+SERVIDOR = DIRETORIO / "distributed_server.py"
+CLIENTE = DIRETORIO / "distributed_client.py"
+HOST = "localhost"
+
+def porta_livre():
+    # Porta TCP livre escolhida pelo sistema operacional
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+def dividir_nucleos(quantidade, nucleos=None):
+    # Divide os núcleos disponíveis em `quantidade` conjuntos disjuntos e contíguos
+    # (os primeiros conjuntos ficam com a sobra). Com menos núcleos que backends os
+    # conjuntos se repetem em rodízio, e o aviso deixa claro que eles competem.
+    nucleos = sorted(nucleos if nucleos is not None else os.sched_getaffinity(0))
+    if len(nucleos) < quantidade:
+        print(f"Aviso: {quantidade} backends para {len(nucleos)} núcleos; os backends vão dividir núcleos.")
+        return [[nucleos[i % len(nucleos)]] for i in range(quantidade)]
+    base, sobra = divmod(len(nucleos), quantidade)
+    conjuntos, inicio = [], 0
+    for i in range(quantidade):
+        fim = inicio + base + (1 if i < sobra else 0)
+        conjuntos.append(nucleos[inicio:fim])
+        inicio = fim
+    return conjuntos
+
+def _fixar_nucleos(nucleos):
+    # preexec_fn do Popen: roda no processo filho antes do exec, então todas as
+    # threads do backend (Numba, BLAS, Pyro5) herdam a afinidade
+    def fixar():
+        os.sched_setaffinity(0, nucleos)
+    return fixar
+
+def _ambiente_threads(num_threads):
+    # BLAS/OpenMP do backend com o mesmo número de threads que núcleos fixados
+    env = dict(os.environ)
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMBA_NUM_THREADS"):
+        env[var] = str(num_threads)
+    return env
+
+def _encerrar(processo, timeout=10):
+    if processo.poll() is not None:
+        return
+    processo.terminate()
+    try:
+        processo.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+        processo.wait()
+
+class ClusterLocal:
+    # Nameserver + N backends locais. `uris` são as URIs diretas (PYRO:nome@host:porta),
+    # que não dependem do nameserver; `nomes` são os PYRONAME: para o cliente por linha
+    # de comando. nameserver=False sobe só os backends.
+    def __init__(self, num_backends, kernel="numba-paralelo", nucleos=None, porta_ns=None,
+                 nameserver=True, diretorio_logs=None, args_servidor=(), prefixo="calc",
+                 timeout=60.0):
+        self.num_backends = num_backends
+        self.kernel = kernel
+        self.conjuntos = dividir_nucleos(num_backends, nucleos)
+        self.porta_ns = porta_ns
+        self.nameserver = nameserver
+        self.diretorio_logs = Path(diretorio_logs) if diretorio_logs else None
+        self.args_servidor = list(args_servidor)
+        self.prefixo = prefixo
+        self.timeout = timeout
+        self.processo_ns = None
+        self.processos = []
+        self.uris = []
+        self.nomes = []
+        self._arquivos = []
+
+    def _saida(self, nome):
+        if self.diretorio_logs is None:
+            return subprocess.DEVNULL
+        self.diretorio_logs.mkdir(parents=True, exist_ok=True)
+        arquivo = open(self.diretorio_logs / f"{nome}.log", "w", encoding="utf8")
+        self._arquivos.append(arquivo)
+        return arquivo
+
+    def _iniciar_nameserver(self):
+        self.porta_ns = self.porta_ns or porta_livre()
+        saida = self._saida("nameserver")
+        self.processo_ns = subprocess.Popen(
+            [sys.executable, "-m", "Pyro5.nameserver", "-n", HOST, "-p", str(self.porta_ns)],
+            stdout=saida, stderr=subprocess.STDOUT)
+        self._aguardar(lambda: Pyro5.api.locate_ns(host=HOST, port=self.porta_ns)._pyroBind(),
+                       self.processo_ns, "nameserver")
+
+    def _aguardar(self, sonda, processo, nome):
+        # Repete `sonda` até ela funcionar, o processo morrer ou o tempo acabar
+        limite = time.time() + self.timeout
+        while time.time() < limite:
+            if processo.poll() is not None:
+                raise RuntimeError(f"{nome} terminou antes de ficar pronto (código {processo.returncode}).")
+            try:
+                sonda()
+                return
+            except (Pyro5.errors.CommunicationError, Pyro5.errors.NamingError):
+                time.sleep(0.2)
+        raise TimeoutError(f"{nome} não ficou pronto em {self.timeout:.0f}s.")
+
+    def _pronto(self, nome, uri):
+        with Pyro5.api.Proxy(uri) as p:
+            p._pyroBind()
+        if self.nameserver:
+            with Pyro5.api.locate_ns(host=HOST, port=self.porta_ns) as ns:
+                ns.lookup(nome)
+
+    def iniciar(self):
+        try:
+            if self.nameserver:
+                self._iniciar_nameserver()
+            fixar = hasattr(os, "sched_setaffinity")
+            if not fixar:
+                print("Aviso: sched_setaffinity indisponível; backends sem núcleos fixados.")
+            for i, nucleos in enumerate(self.conjuntos):
+                nome = f"{self.prefixo}{i + 1}"
+                porta = porta_livre()
+                cmd = [sys.executable, str(SERVIDOR), "--name", nome, "--host", HOST,
+                       "--port", str(porta), "--kernel", self.kernel, "--threads", str(len(nucleos))]
+                cmd += ["--ns-host", HOST, "--ns-port", str(self.porta_ns)] if self.nameserver else ["--ns-host", ""]
+                processo = subprocess.Popen(cmd + self.args_servidor, stdout=self._saida(nome),
+                                            stderr=subprocess.STDOUT, env=_ambiente_threads(len(nucleos)),
+                                            preexec_fn=_fixar_nucleos(nucleos) if fixar else None)
+                self.processos.append(processo)
+                self.uris.append(f"PYRO:{nome}@{HOST}:{porta}")
+                self.nomes.append(f"PYRONAME:{nome}")
+            for nome, uri, processo in zip(self.nomes, self.uris, self.processos):
+                self._aguardar(lambda: self._pronto(nome[len("PYRONAME:"):], uri), processo, uri)
+        except BaseException:
+            self.encerrar()
+            raise
+        for uri, nucleos in zip(self.uris, self.conjuntos):
+            print(f"\t{uri} pronto (núcleos {','.join(map(str, nucleos))})")
+        return self
+
+    def encerrar(self):
+        # Backends primeiro, o nameserver por último
+        for processo in self.processos:
+            _encerrar(processo)
+        if self.processo_ns is not None:
+            _encerrar(self.processo_ns)
+        for arquivo in self._arquivos:
+            arquivo.close()
+        self.processos, self.processo_ns, self._arquivos = [], None, []
+
+    def executar_cliente(self, args_cliente=()):
+        # Roda o distributed_client.py contra este cluster e retorna o código de saída
+        if not self.nameserver:
+            raise RuntimeError("O distributed_client.py precisa do nameserver (nameserver=True).")
+        cmd = [sys.executable, str(CLIENTE), "--ns-host", HOST, "--ns-port", str(self.porta_ns),
+               "--backends", *self.nomes, *args_cliente]
+        return subprocess.call(cmd)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.encerrar()
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sobe nameserver + backends locais, roda o distributed_client.py e encerra tudo.",
+        usage="%(prog)s [opções] -- [argumentos do distributed_client.py]")
+    parser.add_argument("--backends", type=int, default=2, help="número de backends locais")
+    parser.add_argument("--kernel", default="numba-paralelo", help="kernel dos backends")
+    parser.add_argument("--nucleos", default=None,
+                        help="núcleos a dividir entre os backends, ex.: 0-7 ou 0,2,4,6 (default: todos)")
+    parser.add_argument("--porta-ns", type=int, default=None, help="porta do nameserver (default: livre)")
+    parser.add_argument("--logs", default="results/cluster", help="diretório dos logs de cada processo")
+    parser.add_argument("--timeout", type=float, default=60.0, help="espera máxima (s) pelos processos")
+    parser.add_argument("--args-servidor", default="",
+                        help="argumentos extras dos backends, ex.: \"--cache-b 0 --bloco 128\"")
+    parser.add_argument("cliente", nargs=argparse.REMAINDER, help="argumentos do distributed_client.py")
+    args = parser.parse_args()
+
+    args_cliente = args.cliente[1:] if args.cliente[:1] == ["--"] else args.cliente
+    nucleos = None
+    if args.nucleos:
+        nucleos = []
+        for parte in args.nucleos.split(","):
+            ini, _, fim = parte.partition("-")
+            nucleos += range(int(ini), int(fim or ini) + 1)
+
+    print(f"Iniciando cluster local com {args.backends} backends...")
+    with ClusterLocal(args.backends, kernel=args.kernel, nucleos=nucleos, porta_ns=args.porta_ns,
+                      diretorio_logs=args.logs, args_servidor=args.args_servidor.split(),
+                      timeout=args.timeout) as cluster:
+        print(f"Nameserver em {HOST}:{cluster.porta_ns}; logs em {args.logs}")
+        codigo = cluster.executar_cliente(args_cliente)
+    print("Cluster local encerrado.")
+    sys.exit(codigo)
+
+if __name__ == "__main__":
+    main()
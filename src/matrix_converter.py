@@ -0,0 +1,11 @@
+import argparse
+from utils.matrix_io import converter
+
+# Converte matrizes entre o formato texto (.txt) e o binário (.npy)
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("origem", help="arquivo de entrada (.txt ou .npy)")
+    p.add_argument("destino", help="arquivo de saída (.txt ou .npy)")
+    args = p.parse_args()
+    forma = converter(args.origem, args.destino)
+    print(f"Convertido {args.origem} -> {args.destino} ({forma[0]} x {forma[1]})")
@@ -1,32 +1,125 @@
 import random
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import numpy as np
+from utils.matrix_io import criar_npy
+from utils.formatting import ESCALA, formatar_inteiros
+
+# Linhas por bloco no gerador NumPy. Cada bloco tem seu próprio fluxo aleatório
+# (derivado da seed e do índice do bloco), então o resultado não depende do
+# número de processos. Mudar este valor muda as matrizes geradas para uma seed.
+LINHAS_POR_BLOCO = 256
 
 #gera duas matrizes do mesmo tamanho
-def generate(mat_size, out_a, out_b):
+#formato: "txt" (padrão do trabalho), "npy" (binário, abre com memory-map) ou "ambos"
+def generate(mat_size, out_a, out_b, formato="txt"):
     out_a = Path(out_a)
     out_b = Path(out_b)
     out_a.parent.mkdir(parents=True, exist_ok=True)
     out_b.parent.mkdir(parents=True, exist_ok=True)
 
+    gravar_txt = formato in ("txt", "ambos")
+    gravar_npy = formato in ("npy", "ambos")
+    if gravar_npy:
+        npy_a = criar_npy(out_a.with_suffix(".npy"), (mat_size, mat_size))
+        npy_b = criar_npy(out_b.with_suffix(".npy"), (mat_size, mat_size))
+
 #Abre os arquivos contendo as matrizes. 
-    with open(out_a, "w", encoding="utf8") as fa, open(out_b, "w", encoding="utf8") as fb:
+    fa = open(out_a, "w", encoding="utf8") if gravar_txt else None
+    fb = open(out_b, "w", encoding="utf8") if gravar_txt else None
+    try:
         for i in range(mat_size):
             row_a = [] #Cria duas listas vazias para armazenar as linhas das matrizes A e B.
             row_b = []
             for j in range(mat_size):
                 row_a.append(f"{random.uniform(0.15,1.15):.4f}")
                 row_b.append(f"{random.uniform(0.15,1.15):.4f}")
-            fa.write(" ".join(row_a))
-            fb.write(" ".join(row_b))
-            if i != mat_size - 1:
-                fa.write("\n")
-                fb.write("\n")
+            if gravar_npy:
+                #mesmos valores do .txt (já com 4 casas)
+                npy_a[i] = [float(x) for x in row_a]
+                npy_b[i] = [float(x) for x in row_b]
+            if gravar_txt:
+                fa.write(" ".join(row_a))
+                fb.write(" ".join(row_b))
+                if i != mat_size - 1:
+                    fa.write("\n")
+                    fb.write("\n")
+    finally:
+        if gravar_txt:
+            fa.close()
+            fb.close()
+    if gravar_npy:
+        npy_a.flush()
+        npy_b.flush()
+
+def _gerar_bloco(args):
+    # Gera as linhas [inicio, fim) de uma matriz com um Generator próprio do bloco.
+    # Grava no .npy (se houver) e devolve o texto do bloco (se for gravar .txt).
+    entropia, indice_matriz, indice_bloco, inicio, fim, mat_size, caminho_npy, gerar_texto = args
+    seq = np.random.SeedSequence(entropia, spawn_key=(indice_matriz, indice_bloco))
+    rng = np.random.default_rng(seq)
+    #valores com 4 casas decimais, representados como inteiros x 10^4
+    valores = np.rint(rng.uniform(0.15, 1.15, size=(fim - inicio, mat_size)) * ESCALA).astype(np.int64)
+    if caminho_npy is not None:
+        destino = np.load(caminho_npy, mmap_mode="r+")
+        destino[inicio:fim] = valores / ESCALA
+        destino.flush()
+        del destino
+    return formatar_inteiros(valores) if gerar_texto else None
+
+#gerador vetorizado e reprodutível: mesma seed -> mesmas matrizes, byte a byte,
+#com qualquer número de processos
+def gerar_numpy(mat_size, out_a, out_b, seed=None, formato="txt", workers=1):
+    out_a = Path(out_a)
+    out_b = Path(out_b)
+    out_a.parent.mkdir(parents=True, exist_ok=True)
+    out_b.parent.mkdir(parents=True, exist_ok=True)
+    entropia = np.random.SeedSequence(seed).entropy
+
+    gravar_txt = formato in ("txt", "ambos")
+    gravar_npy = formato in ("npy", "ambos")
+    blocos = [(i, min(i + LINHAS_POR_BLOCO, mat_size))
+              for i in range(0, mat_size, LINHAS_POR_BLOCO)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for indice_matriz, saida in enumerate((out_a, out_b)):
+            caminho_npy = None
+            if gravar_npy:
+                caminho_npy = saida.with_suffix(".npy")
+                #cria o arquivo no tamanho final; cada processo preenche seus blocos
+                criar_npy(caminho_npy, (mat_size, mat_size)).flush()
+            tarefas = [(entropia, indice_matriz, k, inicio, fim, mat_size, caminho_npy, gravar_txt)
+                       for k, (inicio, fim) in enumerate(blocos)]
+            #map devolve os blocos em ordem: o texto é gravado sequencialmente
+            resultados = executor.map(_gerar_bloco, tarefas)
+            if gravar_txt:
+                with open(saida, "wb") as f:
+                    for k, texto in enumerate(resultados):
+                        if k > 0:
+                            f.write(b"\n")
+                        f.write(texto)
+            else:
+                for _ in resultados:
+                    pass
+    return entropia
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--size", type=int, default=100, help="matrix size")
     p.add_argument("--outdir", default="data")
+    p.add_argument("--formato", choices=["txt", "npy", "ambos"], default="txt",
+                   help="txt (padrão), npy (binário) ou ambos")
+    p.add_argument("--seed", type=int, default=None,
+                   help="seed do gerador NumPy (sem seed, uma nova é sorteada e impressa)")
+    p.add_argument("--workers", type=int, default=1, help="processos para gerar os blocos de linhas")
+    p.add_argument("--legado", action="store_true",
+                   help="usa o gerador antigo (random.uniform por elemento, sem seed)")
     args = p.parse_args()
-    generate(args.size, f"{args.outdir}/matA.txt", f"{args.outdir}/matB.txt")
+    if args.legado:
+        generate(args.size, f"{args.outdir}/matA.txt", f"{args.outdir}/matB.txt", args.formato)
+    else:
+        seed = gerar_numpy(args.size, f"{args.outdir}/matA.txt", f"{args.outdir}/matB.txt",
+                           seed=args.seed, formato=args.formato, workers=args.workers)
+        print("Seed:", seed)
     print("Generated matA and matB in", args.outdir)
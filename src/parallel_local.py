@@ -1,58 +1,219 @@
 import argparse
+import mmap
+import queue
+import resource
+import threading
+import time
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor
 import multiprocessing
-from src.utils.hash_check import sha256_of_file, save_hash
-from src.utils.timer import TemporizadorSimples, adicionar_log, agora_ts
+from src.utils.hash_check import save_hash
+from src.utils.timer import TemporizadorSimples, adicionar_log, agora_ts, formatar_notas
+from src.utils.ordered_writer import EscritorOrdenado
+from src.utils.matrix_io import FORMATOS, carregar_matriz, criar_npy, forma_matriz, localizar_matriz, texto_para_npy
+from src.utils.cache_resultados import CacheResultados, servir_do_cache
+from src.utils.engines import adicionar_argumentos_engine, executar_engines, validar_engines
 import numpy as np
-from numba import njit, prange
-
-# utiliza Numba para acelerar o cálculo da multiplicação matricial usando paralelismo automático
-@njit(parallel=True, fastmath=True)
-def multiplicacao_numba(matA, matB):
-    n = matA.shape[0]
-    m = matB.shape[1]
-    p = matB.shape[0]
-
-    matC = np.zeros((n, m), dtype=np.float64)
-
-    for i in prange(n):
-        for k in range(p):
-            for j in range(m):
-                matC[i, j] += matA[i, k] * matB[k, j]
-
-    return matC
-
-def multiplicar_linha(args):
-    # Calcula produto de uma linha da matriz A com a matriz B
-    idx, linha, matrizB = args
-    num_colunas = len(matrizB[0])
-    num_elem = len(matrizB)
-    resultado_linha = [0.0 for _ in range(num_colunas)]
-    for j in range(num_colunas):
-        for k in range(num_elem):
-            resultado_linha[j] += linha[k] * matrizB[k][j]
-    return (idx, resultado_linha)
-
-
-def multiplicacao_paralela_local(matA, matB, num_workers):
-    # Multiplicação de matrizes em paralelo usando ProcessPoolExecutor
-    # Cada processo calcula uma linha inteira da matriz C
-    n = len(matA)
-    matC = [[0.0 for _ in range(len(matB[0]))] for _ in range(n)]
-
-    # Mapeamento: Distribuir as subtarefas para os processos
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
-        
-        # Decomposição: Quebrar o problema em subtarefas independentes por linha
-        # Aglomeração: agrupar todos os elementos da mesma linha em uma única tarefa
-        argumentos = [(i, matA[i], matB) for i in range(n)]
-        
-        # Comunicação: Distribuir as subtarefas entre os processos e recolher os resultados
-        for idx, linha_resultante in executor.map(multiplicar_linha, argumentos):
-            matC[idx] = linha_resultante
-
-    return matC
+
+# ---------------------------------------------------------------------------
+# Modo fora do núcleo (out-of-core): A, B e C ficam em .npy no disco e só tiles
+# passam pela memória. Cada tile de C (T x T) fica residente enquanto os painéis
+# A[i, k] e B[k, j] são lidos em sequência (T x T cada); o laço em k alterna de
+# sentido a cada tile de C (serpentina), então o último tile de A de um tile de C é
+# o primeiro do seguinte e não é relido. Uma thread lê os próximos tiles do disco
+# enquanto o atual é multiplicado.
+
+class _NpyMapeado:
+    # .npy aberto com um mmap próprio (o np.memmap não expõe o seu) para poder
+    # liberar as páginas de um intervalo de linhas com madvise
+    def __init__(self, caminho, gravavel=False):
+        with open(caminho, "r+b" if gravavel else "rb") as f:
+            versao = np.lib.format.read_magic(f)
+            ler_cabecalho = (np.lib.format.read_array_header_1_0 if versao == (1, 0)
+                             else np.lib.format.read_array_header_2_0)
+            forma, fortran, dtype = ler_cabecalho(f)
+            self.offset = f.tell()
+            self.mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if gravavel else mmap.ACCESS_READ)
+        self.matriz = np.ndarray(forma, dtype=dtype, buffer=self.mapa, offset=self.offset,
+                                 order="F" if fortran else "C")
+
+    def liberar_linhas(self, i0, i1):
+        # Páginas de um memory-map lidas/escritas contam no RSS do processo até o kernel
+        # as reciclar; MADV_DONTNEED devolve já as das linhas i0:i1. Num mapa
+        # compartilhado as páginas alteradas continuam no page cache e vão para o
+        # arquivo normalmente: não é preciso flush a cada grupo, só no final.
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        if not self.matriz.flags.c_contiguous:
+            self.mapa.madvise(mmap.MADV_DONTNEED)
+            return
+        passo = self.matriz.strides[0]
+        inicio = self.offset + i0 * passo
+        fim = self.offset + i1 * passo
+        inicio -= inicio % mmap.PAGESIZE
+        self.mapa.madvise(mmap.MADV_DONTNEED, inicio, fim - inicio)
+
+def _copiar_tile(mapeada, i0, i1, j0, j1, linhas_por_grupo=32):
+    # Copia um tile do memory-map para a memória. Cada linha tocada mapeia também as
+    # páginas vizinhas (fault-around do kernel), então a cópia é feita em grupos de
+    # linhas, liberando as páginas do memory-map a cada grupo
+    tile = np.empty((i1 - i0, j1 - j0), dtype=np.float64)
+    for r0 in range(i0, i1, linhas_por_grupo):
+        r1 = min(r0 + linhas_por_grupo, i1)
+        tile[r0 - i0:r1 - i0] = mapeada.matriz[r0:r1, j0:j1]
+        mapeada.liberar_linhas(r0, r1)
+    return tile
+
+def planejar_tile(n, k, m, memoria_max):
+    # Em memória ao mesmo tempo: tile de C + área de trabalho (2 T²) e até 3 pares de
+    # tiles A/B (o em uso, o pronto na fila e o que a thread está lendo: 6 T²)
+    tile = int((memoria_max / 8 / 8) ** 0.5)
+    if tile < 1:
+        raise MemoryError(f"Orçamento de {memoria_max} bytes não comporta nenhum tile.")
+    return min(tile, max(n, k, m))
+
+def agenda_fora_do_nucleo(n, k, m, tile):
+    # Ordem dos produtos: tiles de C por linhas; k em serpentina para reaproveitar o tile de A
+    sentido = 1
+    for i0 in range(0, n, tile):
+        for j0 in range(0, m, tile):
+            paineis = list(range(0, k, tile))[::sentido]
+            for passo, k0 in enumerate(paineis):
+                yield (i0, min(i0 + tile, n), j0, min(j0 + tile, m),
+                       k0, min(k0 + tile, k), passo == len(paineis) - 1)
+            sentido = -sentido
+
+def _ler_tiles(A, B, agenda, fila, erro):
+    # Thread de prefetch: lê os pares de tiles na ordem da agenda e os coloca na fila
+    # (tamanho 1); tiles iguais ao anterior são reaproveitados sem nova leitura
+    try:
+        anterior_A = anterior_B = (None, None)
+        for i0, i1, j0, j1, k0, k1, ultimo in agenda:
+            chave_A, chave_B = (i0, k0), (k0, j0)
+            tile_A = anterior_A[1] if anterior_A[0] == chave_A else _copiar_tile(A, i0, i1, k0, k1)
+            tile_B = anterior_B[1] if anterior_B[0] == chave_B else _copiar_tile(B, k0, k1, j0, j1)
+            anterior_A, anterior_B = (chave_A, tile_A), (chave_B, tile_B)
+            fila.put((i0, i1, j0, j1, tile_A, tile_B, ultimo))
+    except BaseException as e:
+        erro.append(e)
+    finally:
+        fila.put(None)
+
+def multiplicacao_fora_do_nucleo(caminho_A, caminho_B, caminho_C, memoria_max, tile=None):
+    # C = A @ B com A e B lidas de .npy por memory-map e C acumulada em caminho_C (.npy).
+    # memoria_max (bytes) limita os buffers de tiles; o restante do processo
+    # (interpretador, NumPy) fica fora do orçamento. O produto de cada par de tiles
+    # usa a BLAS do NumPy (multi-thread).
+    A = _NpyMapeado(caminho_A)
+    B = _NpyMapeado(caminho_B)
+    n, k = A.matriz.shape
+    m = B.matriz.shape[1]
+    if B.matriz.shape[0] != k:
+        raise ValueError(f"Dimensões incompatíveis: A {A.matriz.shape} x B {B.matriz.shape}")
+    tile = tile or planejar_tile(n, k, m, memoria_max)
+    # o .npy de C é criado no tamanho final e reaberto com o mmap próprio
+    criar_npy(caminho_C, (n, m)).flush()
+    C = _NpyMapeado(caminho_C, gravavel=True)
+
+    fila = queue.Queue(maxsize=1)
+    erro = []
+    leitor = threading.Thread(target=_ler_tiles, daemon=True,
+                              args=(A, B, agenda_fora_do_nucleo(n, k, m, tile), fila, erro))
+    leitor.start()
+
+    acumulado = np.zeros((tile, tile), dtype=np.float64)
+    trabalho = np.empty((tile, tile), dtype=np.float64)
+    espera = 0.0
+    produtos = 0
+    while True:
+        inicio = time.time()
+        item = fila.get()
+        espera += time.time() - inicio
+        if item is None:
+            break
+        i0, i1, j0, j1, tile_A, tile_B, ultimo = item
+        c = acumulado[:i1 - i0, :j1 - j0]
+        w = trabalho[:i1 - i0, :j1 - j0]
+        np.matmul(tile_A, tile_B, out=w)
+        c += w
+        produtos += 1
+        if ultimo:
+            for r0 in range(i0, i1, 32):
+                r1 = min(r0 + 32, i1)
+                C.matriz[r0:r1, j0:j1] = c[r0 - i0:r1 - i0]
+                C.liberar_linhas(r0, r1)
+            c[:] = 0.0
+    leitor.join()
+    if erro:
+        raise erro[0]
+    C.mapa.flush()
+    del C
+    return {"tile": tile, "produtos": produtos, "espera_leitura": espera,
+            "pico_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+def _garantir_npy(caminho, diretorio, memoria_max):
+    # O modo fora do núcleo precisa de .npy; .txt é convertido em faixas para `diretorio`.
+    # O parser de texto usa várias vezes o tamanho da faixa, por isso o divisor
+    caminho = Path(caminho)
+    if caminho.suffix == ".npy":
+        return caminho
+    destino = Path(diretorio) / f"{caminho.stem}.npy"
+    print(f"Convertendo {caminho} -> {destino} (em faixas)")
+    texto_para_npy(caminho, destino, bytes_por_faixa=max(1 << 20, int(memoria_max // 16)))
+    return destino
+
+def escrever_npy_como_texto(caminho_txt, caminho_npy, memoria_max):
+    # Grava o matC.txt a partir do .npy em blocos de linhas (hash calculado durante a escrita)
+    C = _NpyMapeado(caminho_npy)
+    n, m = C.matriz.shape
+    # cada linha ocupa 8 bytes por valor no bloco e ~10 no texto formatado
+    linhas_por_bloco = max(1, int(memoria_max // (m * 8 * 4)))
+    escritor = EscritorOrdenado(caminho_txt, n)
+    for inicio in range(0, n, linhas_por_bloco):
+        fim = min(inicio + linhas_por_bloco, n)
+        escritor.adicionar(inicio, np.array(C.matriz[inicio:fim]))
+        C.liberar_linhas(inicio, fim)
+    return escritor.fechar()
+
+
+def executar_fora_do_nucleo(args):
+    # Versão do main para matrizes maiores que a memória: nada é carregado inteiro.
+    # Não há processos: o paralelismo é o da BLAS, e é ele que vai para o log
+    # (kernels importa o Numba, por isso só aqui)
+    from src.utils.kernels import limitar_blas, threads_blas
+    num_threads = limitar_blas(args.threads) if args.threads else (threads_blas() or 1)
+    temporizador_carga = TemporizadorSimples()
+    temporizador_carga.iniciar()
+    dir_npy = Path(args.outdir) / "fora_do_nucleo"
+    memoria_max = args.memoria_mb * 1024 * 1024
+    path_A = _garantir_npy(localizar_matriz(args.matdir, "matA", args.formato), dir_npy, memoria_max)
+    path_B = _garantir_npy(localizar_matriz(args.matdir, "matB", args.formato), dir_npy, memoria_max)
+    tempo_carga, _ = temporizador_carga.parar()
+
+    path_C_npy = Path(args.outdir) / "matC.npy"
+    temporizador = TemporizadorSimples()
+    temporizador.iniciar()
+    estatisticas = multiplicacao_fora_do_nucleo(path_A, path_B, path_C_npy, memoria_max, args.tile)
+    tempo_clock, tempo_cpu = temporizador.parar()
+
+    h = escrever_npy_como_texto(f"{args.outdir}/matC.txt", path_C_npy, memoria_max)
+    save_hash(h, f"{args.outdir}/hash.txt")
+
+    cabecalho = ["modo","num_processos","tempo_clock","tempo_cpu","tempo_comunicacao","tempo_total","timestamp","notas"]
+    (n, k), m = forma_matriz(path_A), forma_matriz(path_B)[1]
+    notas = formatar_notas(carga=f"{tempo_carga:.3f}", dims=f"{n}x{k}x{m}", fora_do_nucleo=1, tile=estatisticas["tile"],
+                           espera_leitura=f"{estatisticas['espera_leitura']:.3f}",
+                           pico_rss_mb=f"{estatisticas['pico_rss_mb']:.0f}", cache="off")
+    linha_log = ["paralelo_local", num_threads, f"{tempo_clock:.6f}", f"{tempo_cpu:.6f}", 0.0, f"{tempo_clock:.6f}", agora_ts(), notas]
+    adicionar_log(f"{args.outdir}/run_logs.csv", linha_log, cabecalho)
+
+    print("Multiplicação fora do núcleo concluída.")
+    print(f"Tile: {estatisticas['tile']} | produtos de tiles: {estatisticas['produtos']} | "
+          f"espera por leitura: {estatisticas['espera_leitura']:.2f}s")
+    print(f"Pico de RSS: {estatisticas['pico_rss_mb']:.0f} MB (orçamento de tiles: {args.memoria_mb:.1f} MB)")
+    print("Threads da BLAS:", num_threads)
+    print("Tempo (clock):", tempo_clock, "CPU:", tempo_cpu)
+    print("Hash:", h)
+    return h
 
 
 def main():
@@ -60,65 +221,69 @@ def main():
     parser.add_argument("--matdir", default="data", help="Diretório das matrizes")
     parser.add_argument("--outdir", default="results", help="Diretório de saída")
     parser.add_argument("--workers", type=int, default=None, help="Número de processadores (default: cpu_count())")
+    parser.add_argument("--formato", choices=FORMATOS, default="auto",
+                        help="Formato das matrizes de entrada (auto: .npy se existir, senão .txt)")
+    parser.add_argument("--exato", action="store_true",
+                        help="Multiplicação exata em ponto fixo int64 (entradas com 4 casas)")
+    parser.add_argument("--memoria-mb", type=float, default=None,
+                        help="Modo fora do núcleo: A, B e C ficam em .npy no disco e os tiles em "
+                             "memória respeitam este orçamento (MB)")
+    parser.add_argument("--tile", type=int, default=None,
+                        help="Lado do tile no modo fora do núcleo (default: calculado pelo orçamento)")
+    parser.add_argument("--sem-cache", "--no-cache", dest="sem_cache", action="store_true",
+                        help="Recalcula mesmo se o resultado deste (A, B) já estiver no cache (só --exato)")
+    parser.add_argument("--cache-dir", default="results/cache", help="Diretório do cache de resultados")
+    parser.add_argument("--cache-mb", type=float, default=2048, help="Tamanho máximo do cache (MB, LRU)")
+    adicionar_argumentos_engine(parser, "memoria_compartilhada", None,
+                                "Threads das engines numba e blas (default: --workers)")
     args = parser.parse_args()
 
     Path(args.outdir).mkdir(parents=True, exist_ok=True)
 
-    # Carregar matrizes
-    matA = []
-    matB = []
-    with open(f"{args.matdir}/matA.txt", "r") as f:
-        for linha in f:
-            matA.append([float(x) for x in linha.strip().split()])
-    with open(f"{args.matdir}/matB.txt", "r") as f:
-        for linha in f:
-            matB.append([float(x) for x in linha.strip().split()])
-
     # Mapeamento: Definir número de workers
     num_workers = args.workers or multiprocessing.cpu_count()
 
-    # Multiplicação paralela e medição de tempo
-    temporizador = TemporizadorSimples()
-    temporizador.iniciar()
-    # converter para numpy
-    matC = multiplicacao_paralela_local(matA, matB, num_workers)
-
-    
-    #matA = np.array(matA, dtype=np.float64)
-    #matB = np.array(matB, dtype=np.float64)
-    #set_num_threads(num_workers)
-    #_ = multiplicacao_numba(matA[:2, :2], matB[:2, :2])
-    #temporizador.iniciar()
-    #matC = multiplicacao_numba(matA, matB)
-    
-    matC = matC.tolist()
-    tempo_clock, tempo_cpu = temporizador.parar()
+    if args.memoria_mb and args.exato:
+        parser.error("--exato ainda não é suportado no modo fora do núcleo (--memoria-mb)")
+    if args.memoria_mb and args.engine != ["memoria_compartilhada"]:
+        parser.error("o modo fora do núcleo (--memoria-mb) tem engine própria; não use --engine")
+    if args.memoria_mb and args.workers:
+        parser.error("o modo fora do núcleo (--memoria-mb) não usa processos; "
+                     "use --threads para as threads da BLAS")
+    validar_engines(parser, args)
 
-    # Salvar matriz resultante
+    path_matA = localizar_matriz(args.matdir, "matA", args.formato)
+    path_matB = localizar_matriz(args.matdir, "matB", args.formato)
     path_matC = f"{args.outdir}/matC.txt"
-    with open(path_matC, "w") as f:
-        for i, linha in enumerate(matC):
-            if i > 0:
-                f.write("\n")
-            f.write(" ".join(f"{valor:.4f}" for valor in linha))
-
-    # Calcular hash e salvar
-    h = sha256_of_file(path_matC)
-    save_hash(h, f"{args.outdir}/hash.txt")
 
-    # Salvar log
-    cabecalho = ["modo","num_processos","tempo_clock","tempo_cpu","tempo_comunicacao","tempo_total","timestamp","notas"]
-    linha_log = ["paralelo_local", num_workers, f"{tempo_clock:.6f}", f"{tempo_cpu:.6f}", 0.0, f"{tempo_clock:.6f}", agora_ts(), ""]
-    adicionar_log(f"{args.outdir}/run_logs.csv", linha_log, cabecalho)
+    # Mesmo (A, B) já calculado antes com --exato (em qualquer modo): devolve o matC.txt
+    # do cache. Comparando várias engines o cache não é consultado (cada uma precisa calcular).
+    cache = CacheResultados(args.cache_dir, args.cache_mb) if args.exato and not args.sem_cache else None
+    chave = None
+    if cache is not None:
+        chave = cache.chave(path_matA, path_matB)
+        if len(args.engine) == 1 and servir_do_cache(cache, chave, path_matC, args.outdir, "paralelo_local", num_workers):
+            return
 
+    if args.memoria_mb:
+        executar_fora_do_nucleo(args)
+        return
+
+    # Carregar matrizes (.npy é aberto com memory-map, sem ler tudo para a memória;
+    # .txt é lido em paralelo). Tempo de carga medido à parte, fora do tempo_clock.
+    temporizador_carga = TemporizadorSimples()
+    temporizador_carga.iniciar()
+    matA = carregar_matriz(path_matA, workers=num_workers)
+    matB = carregar_matriz(path_matB, workers=num_workers)
+    tempo_carga, _ = temporizador_carga.parar()
+    print(f"Matrizes carregadas em {tempo_carga:.3f}s")
+
+    # Multiplicação com cada engine pedida e medição de tempo
+    executar_engines(args, matA, matB, "paralelo_local",
+                     {"processos": num_workers, "threads": args.threads or num_workers},
+                     path_matC, tempo_carga, cache, chave)
     print("Multiplicação local paralela concluída.")
     print("Workers:", num_workers)
-    print("Tempo (clock):", tempo_clock, "CPU:", tempo_cpu)
-    horas = int(tempo_clock // 3600)
-    minutos = int((tempo_clock % 3600) // 60)
-    segundos = tempo_clock % 60
-    print(f"Tempo real: {horas}h {minutos}min {segundos:.2f}s")
-    print("Hash:", h)
     '''
     hash_result = f"{args.outdir}/hash_result.txt"
     with open(hash_result, "r") as f:
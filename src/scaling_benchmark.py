@@ -0,0 +1,187 @@
+import argparse
+import csv
+import json
+import socket
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+import numpy as np
+
+# Mesma raiz de import do distributed_client e do local_cluster (utils.*, com src/ no
+# sys.path por ser o diretório do script): misturar src.utils.* carregaria cada módulo duas vezes
+from utils.engines import multiplicacao_linear_for
+from utils.memoria_compartilhada import multiplicacao_memoria_compartilhada
+from distributed_client import multiplicacao_distribuida
+from local_cluster import ClusterLocal
+
+# Benchmark de escalabilidade dos três modos de multiplicação.
+# Varia o tamanho n, o número de workers (paralelo local) e o número de backends
+# (distribuído, com backends locais do local_cluster.ClusterLocal) e registra
+# mediana/percentis do tempo, GFLOPS, speedup e eficiência em CSV e JSON.
+# Também compara com uma baseline salva e aponta regressões.
+
+HOST = socket.gethostname()
+
+CAMPOS = ["timestamp", "host", "modo", "n", "p", "repeticoes", "mediana_s", "p10_s", "p90_s",
+          "min_s", "gflops", "referencia", "speedup", "eficiencia"]
+
+def gerar_entradas(n, seed):
+    # Matrizes no mesmo intervalo do matrix_generator, com 4 casas decimais
+    rng = np.random.default_rng(seed)
+    A = np.round(rng.uniform(0.15, 1.15, size=(n, n)), 4)
+    B = np.round(rng.uniform(0.15, 1.15, size=(n, n)), 4)
+    return A, B
+
+def medir(fn, repeticoes):
+    # Executa fn `repeticoes` vezes e retorna os tempos de parede
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+def resumir(modo, n, p, tempos):
+    return {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "host": HOST, "modo": modo, "n": n, "p": p, "repeticoes": len(tempos),
+        "mediana_s": float(np.median(tempos)),
+        "p10_s": float(np.percentile(tempos, 10)),
+        "p90_s": float(np.percentile(tempos, 90)),
+        "min_s": float(min(tempos)),
+        "gflops": 2.0 * n ** 3 / float(np.median(tempos)) / 1e9,
+    }
+
+def completar_metricas(linhas):
+    # Speedup e eficiência em relação ao linear do mesmo n; sem linear medido,
+    # a referência é o paralelo local com menos workers
+    for n in {l["n"] for l in linhas}:
+        do_n = [l for l in linhas if l["n"] == n]
+        lin = [l for l in do_n if l["modo"] == "linear"]
+        loc = sorted((l for l in do_n if l["modo"] == "paralelo_local"), key=lambda l: l["p"])
+        if lin:
+            ref, nome_ref = lin[0]["mediana_s"], "linear"
+        elif loc:
+            ref, nome_ref = loc[0]["mediana_s"] * loc[0]["p"], f"paralelo_local(p={loc[0]['p']})*p"
+        else:
+            ref, nome_ref = None, ""
+        for l in do_n:
+            l["referencia"] = nome_ref
+            l["speedup"] = ref / l["mediana_s"] if ref else float("nan")
+            l["eficiencia"] = l["speedup"] / l["p"] if ref else float("nan")
+    return linhas
+
+def chave(linha):
+    return f"{linha['modo']}|{linha['n']}|{linha['p']}"
+
+def comparar_baseline(linhas, caminho_baseline, tolerancia):
+    # Regressão: mediana atual maior que a da baseline por mais que a tolerância
+    with open(caminho_baseline, encoding="utf8") as f:
+        baseline = {chave(l): l for l in json.load(f)["resultados"]}
+    regressoes = []
+    for l in linhas:
+        base = baseline.get(chave(l))
+        if base is None:
+            continue
+        razao = l["mediana_s"] / base["mediana_s"]
+        if razao > 1 + tolerancia:
+            regressoes.append((chave(l), base["mediana_s"], l["mediana_s"], razao))
+    return regressoes
+
+def salvar_csv(linhas, caminho):
+    # Acumula as execuções no mesmo CSV, como o run_logs.csv
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    existe = caminho.exists()
+    with open(caminho, "a", newline="", encoding="utf8") as f:
+        w = csv.DictWriter(f, fieldnames=CAMPOS)
+        if not existe:
+            w.writeheader()
+        w.writerows(linhas)
+
+def salvar_json(linhas, caminho, args):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf8") as f:
+        json.dump({"host": HOST, "parametros": vars(args), "resultados": linhas}, f, indent=2)
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--tamanhos", type=int, nargs="+", default=[128, 256, 512])
+    p.add_argument("--modos", nargs="+", default=["linear", "paralelo_local", "distribuido"],
+                   choices=["linear", "paralelo_local", "distribuido"])
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                   help="números de workers do paralelo local")
+    p.add_argument("--backends", type=int, nargs="+", default=[1, 2],
+                   help="números de backends locais do distribuído")
+    p.add_argument("--repeticoes", type=int, default=5)
+    p.add_argument("--linear-max", type=int, default=256,
+                   help="maior n executado no modo linear (Python puro é O(n^3) lento)")
+    p.add_argument("--kernel", default="numba-paralelo", help="kernel dos backends")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--saida", default="results/escala", help="prefixo dos arquivos .csv/.json")
+    p.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparar")
+    p.add_argument("--salvar-baseline", default=None, help="salva esta execução como baseline (JSON)")
+    p.add_argument("--tolerancia", type=float, default=0.10,
+                   help="aumento relativo da mediana considerado regressão")
+    return p.parse_args()
+
+def main():
+    args = parse_args()
+    linhas = []
+
+    for n in args.tamanhos:
+        A, B = gerar_entradas(n, args.seed)
+        print(f"\n=== n={n} ===")
+
+        if "linear" in args.modos and n <= args.linear_max:
+            A_l, B_l = A.tolist(), B.tolist()
+            tempos = medir(lambda: multiplicacao_linear_for(A_l, B_l), args.repeticoes)
+            linhas.append(resumir("linear", n, 1, tempos))
+            print(f"linear: {linhas[-1]['mediana_s']:.4f}s")
+
+        if "paralelo_local" in args.modos:
+            for w in args.workers:
+                tempos = medir(lambda: multiplicacao_memoria_compartilhada(A, B, w), args.repeticoes)
+                linhas.append(resumir("paralelo_local", n, w, tempos))
+                print(f"paralelo_local p={w}: {linhas[-1]['mediana_s']:.4f}s")
+
+        if "distribuido" in args.modos:
+            for k in args.backends:
+                # backends sem nameserver, cada um fixado na sua parte dos núcleos
+                with ClusterLocal(k, kernel=args.kernel, nameserver=False,
+                                  args_servidor=["--progresso", "3600"]) as cluster:
+                    # aquecimento: compila o kernel Numba e popula o cache de B nos backends.
+                    # Sem compressão: o codec "auto" mede os codecs e sonda a banda a cada
+                    # chamada (tempo que entraria na medição) e pode mudar entre repetições
+                    multiplicacao_distribuida(A, B, cluster.uris, codec="nenhum")
+                    tempos = medir(lambda: multiplicacao_distribuida(A, B, cluster.uris, codec="nenhum"),
+                                   args.repeticoes)
+                linhas.append(resumir("distribuido", n, k, tempos))
+                print(f"distribuido backends={k}: {linhas[-1]['mediana_s']:.4f}s")
+
+    completar_metricas(linhas)
+
+    print(f"\n{'modo':<16}{'n':>6}{'p':>4}{'mediana(s)':>12}{'p90(s)':>10}{'GFLOPS':>9}{'speedup':>9}{'efic.':>7}")
+    for l in linhas:
+        print(f"{l['modo']:<16}{l['n']:>6}{l['p']:>4}{l['mediana_s']:>12.4f}{l['p90_s']:>10.4f}"
+              f"{l['gflops']:>9.3f}{l['speedup']:>9.2f}{l['eficiencia']:>7.2f}")
+
+    salvar_csv(linhas, Path(f"{args.saida}.csv"))
+    salvar_json(linhas, Path(f"{args.saida}.json"), args)
+    print(f"\nResultados salvos em {args.saida}.csv e {args.saida}.json")
+
+    if args.salvar_baseline:
+        salvar_json(linhas, Path(args.salvar_baseline), args)
+        print("Baseline salva em", args.salvar_baseline)
+
+    if args.baseline:
+        regressoes = comparar_baseline(linhas, args.baseline, args.tolerancia)
+        if regressoes:
+            print(f"\nREGRESSÕES (> {args.tolerancia:.0%} mais lento que a baseline):")
+            for k, antes, agora, razao in regressoes:
+                print(f"  {k}: {antes:.4f}s -> {agora:.4f}s ({razao:.2f}x)")
+            sys.exit(1)
+        print("\nSem regressões em relação à baseline.")
+
+if __name__ == "__main__":
+    main()
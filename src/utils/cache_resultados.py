@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from .formatting import VERSAO_FORMATO
+from .hash_check import save_hash, sha256_of_file
+from .timer import TemporizadorSimples, adicionar_log, agora_ts, formatar_notas
+
+# Cache de resultados endereçado por conteúdo: o mesmo par (A, B) multiplicado de
+# novo com --exato, em qualquer modo, devolve o matC.txt já calculado em vez de
+# recalcular. Só o ponto fixo entra: em float o arredondamento depende da ordem das
+# somas (modo, engine, tile, bloco, threads da BLAS), e um matC.txt de outra ordem
+# teria outro hash. A chave é o SHA-256 dos arquivos de A e B e a versão do formato
+# do matC.txt.
+# Cada entrada é um diretório <chave>/ com matC.txt, hash.txt e info.json; o mtime
+# do diretório marca o último uso e as entradas menos usadas saem primeiro quando
+# o total passa do limite.
+
+TAMANHO_PEDACO = 4 * 1024 * 1024
+
+def _copiar_com_hash(origem, destino):
+    # Copia o arquivo calculando o SHA-256 no caminho (confere a entrada sem reler)
+    h = hashlib.sha256()
+    with open(origem, "rb") as fo, open(destino, "wb") as fd:
+        for pedaco in iter(lambda: fo.read(TAMANHO_PEDACO), b""):
+            h.update(pedaco)
+            fd.write(pedaco)
+    return h.hexdigest()
+
+def _tamanho(diretorio):
+    return sum(f.stat().st_size for f in diretorio.iterdir() if f.is_file())
+
+class CacheResultados:
+    def __init__(self, diretorio="results/cache", limite_mb=2048):
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.limite = limite_mb * 1024 * 1024
+        self.infos = {}
+
+    def chave(self, caminho_A, caminho_B):
+        info = {"sha_A": sha256_of_file(caminho_A), "sha_B": sha256_of_file(caminho_B),
+                "versao_formato": VERSAO_FORMATO, "variante": "exato"}
+        texto = f"{info['sha_A']}|{info['sha_B']}|v{VERSAO_FORMATO}|exato"
+        chave = hashlib.sha256(texto.encode()).hexdigest()
+        self.infos[chave] = info
+        return chave
+
+    def buscar(self, chave, destino_matC):
+        # Copia o matC.txt da entrada para destino_matC e retorna o hash, ou None.
+        # Uma entrada cujo conteúdo não confere com o hash guardado é descartada.
+        entrada = self.diretorio / chave
+        try:
+            h = (entrada / "hash.txt").read_text(encoding="utf8").strip()
+        except OSError:
+            return None
+        Path(destino_matC).parent.mkdir(parents=True, exist_ok=True)
+        if _copiar_com_hash(entrada / "matC.txt", destino_matC) != h:
+            print(f"Aviso: entrada {chave[:16]} do cache corrompida; descartada.")
+            shutil.rmtree(entrada, ignore_errors=True)
+            return None
+        os.utime(entrada)
+        return h
+
+    def guardar(self, chave, caminho_matC, hash_C):
+        # Copia (não move nem cria link: o próximo run sobrescreve o matC.txt de saída)
+        if Path(caminho_matC).stat().st_size > self.limite:
+            return False
+        entrada = self.diretorio / chave
+        tmp = self.diretorio / f".{chave}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        try:
+            shutil.copyfile(caminho_matC, tmp / "matC.txt")
+            save_hash(hash_C, tmp / "hash.txt")
+            info = dict(self.infos.get(chave, {}), criado=agora_ts())
+            (tmp / "info.json").write_text(json.dumps(info, indent=2), encoding="utf8")
+            if entrada.exists():
+                shutil.rmtree(entrada, ignore_errors=True)
+            os.replace(tmp, entrada)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.podar()
+        return True
+
+    def podar(self):
+        # Remove as entradas usadas há mais tempo até o total caber no limite
+        entradas = sorted((d for d in self.diretorio.iterdir() if d.is_dir() and not d.name.startswith(".")),
+                          key=lambda d: d.stat().st_mtime)
+        total = sum(_tamanho(d) for d in entradas)
+        while entradas and total > self.limite:
+            d = entradas.pop(0)
+            total -= _tamanho(d)
+            shutil.rmtree(d, ignore_errors=True)
+
+def servir_do_cache(cache, chave, caminho_matC, outdir, modo, num_processos):
+    # Acerto no cache: grava matC.txt e hash.txt como numa execução normal e registra
+    # a execução no run_logs.csv com cache=hit. Retorna o hash, ou None se não há entrada.
+    temporizador = TemporizadorSimples()
+    temporizador.iniciar()
+    h = cache.buscar(chave, caminho_matC)
+    if h is None:
+        return None
+    tempo_clock, tempo_cpu = temporizador.parar()
+    save_hash(h, f"{outdir}/hash.txt")
+    cabecalho = ["modo","num_processos","tempo_clock","tempo_cpu","tempo_comunicacao","tempo_total","timestamp","notas"]
+    linha_log = [modo, num_processos, f"{tempo_clock:.6f}", f"{tempo_cpu:.6f}", 0.0, f"{tempo_clock:.6f}",
+                 agora_ts(), formatar_notas(cache="hit", chave=chave[:16])]
+    adicionar_log(f"{outdir}/run_logs.csv", linha_log, cabecalho)
+    print(f"Resultado encontrado no cache ({chave[:16]}), multiplicação dispensada.")
+    print("Hash:", h)
+    return h
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+from .hash_check import sha256_of_file
+
+def chave_job(*caminhos):
+    # Identifica um job pelo SHA-256 dos arquivos de entrada (ex.: matA e matB)
+    h = hashlib.sha256()
+    for caminho in caminhos:
+        h.update(sha256_of_file(caminho).encode())
+    return h.hexdigest()[:16]
+
+class CheckpointBlocos:
+    # Guarda em disco os blocos de C já calculados (um .npy por intervalo de linhas)
+    # para que uma nova execução do mesmo job continue de onde parou
+    def __init__(self, diretorio):
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+
+    def _arquivo(self, inicio, fim):
+        return self.diretorio / f"bloco_{inicio:09d}_{fim:09d}.npy"
+
+    def salvar(self, inicio, fim, bloco):
+        # Escreve num arquivo temporário e renomeia: um bloco interrompido no meio
+        # da escrita nunca é lido como completo
+        final = self._arquivo(inicio, fim)
+        tmp = final.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            # mantém o dtype: blocos int64 do modo exato não podem virar float64
+            np.save(f, np.asarray(bloco))
+        os.replace(tmp, final)
+
+    def carregar(self):
+        # Retorna {inicio: (fim, bloco)} de todos os blocos completos
+        blocos = {}
+        for arq in sorted(self.diretorio.glob("bloco_*.npy")):
+            _, inicio, fim = arq.stem.split("_")
+            blocos[int(inicio)] = (int(fim), np.load(arq))
+        return blocos
+
+    def limpar(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
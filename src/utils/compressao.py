@@ -0,0 +1,84 @@
+import lzma
+import struct
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Codecs de compressão dos buffers trafegados (B, blocos de A e blocos de C).
+# Um buffer comprimido carrega o nome do codec em um cabeçalho:
+#   MAGICO | len(nome) | nome (ex.: "zlib-1") | dados comprimidos
+# Buffers sem o cabeçalho passam direto (codec "nenhum"), então quem recebe
+# não precisa saber de antemão qual codec foi usado.
+MAGICO = b"CMP1"
+
+CODECS = {
+    "zlib-1": (lambda d: zlib.compress(d, 1), zlib.decompress),
+    "zlib-6": (lambda d: zlib.compress(d, 6), zlib.decompress),
+    "zlib-9": (lambda d: zlib.compress(d, 9), zlib.decompress),
+    "lzma-1": (lambda d: lzma.compress(d, preset=1), lzma.decompress),
+    "lzma-6": (lambda d: lzma.compress(d, preset=6), lzma.decompress),
+}
+
+# zstd e lz4 só entram se os pacotes opcionais estiverem instalados
+if zstandard is not None:
+    for _nivel in (1, 3, 9):
+        CODECS[f"zstd-{_nivel}"] = (zstandard.ZstdCompressor(level=_nivel).compress,
+                                   lambda d: zstandard.ZstdDecompressor().decompress(d))
+if lz4 is not None:
+    CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+
+def codecs_disponiveis():
+    return ["nenhum"] + sorted(CODECS)
+
+def empacotar(dados, codec="nenhum"):
+    if codec == "nenhum":
+        return dados
+    if codec not in CODECS:
+        raise ValueError(f"Codec desconhecido ou não instalado: {codec}")
+    nome = codec.encode()
+    return MAGICO + struct.pack("<B", len(nome)) + nome + CODECS[codec][0](dados)
+
+def desempacotar(dados):
+    if dados[:4] != MAGICO:
+        return dados
+    (tam_nome,) = struct.unpack_from("<B", dados, 4)
+    codec = bytes(dados[5:5 + tam_nome]).decode()
+    if codec not in CODECS:
+        raise ValueError(f"Buffer comprimido com codec indisponível aqui: {codec}")
+    return CODECS[codec][1](memoryview(dados)[5 + tam_nome:])
+
+def medir_codecs(amostra, codecs=None):
+    # Mede razão de compressão e vazão (bytes/s) de compressão e descompressão
+    # de cada codec sobre uma amostra dos dados reais
+    medidas = {"nenhum": {"razao": 1.0, "comprimir": float("inf"), "descomprimir": float("inf")}}
+    for nome in codecs or CODECS:
+        if nome == "nenhum":
+            continue
+        comprimir, descomprimir = CODECS[nome]
+        inicio = time.perf_counter()
+        comprimido = comprimir(amostra)
+        meio = time.perf_counter()
+        descomprimir(comprimido)
+        fim = time.perf_counter()
+        medidas[nome] = {"razao": len(amostra) / len(comprimido),
+                         "comprimir": len(amostra) / max(meio - inicio, 1e-9),
+                         "descomprimir": len(amostra) / max(fim - meio, 1e-9)}
+    return medidas
+
+def estimar_tempo(medida, tamanho, banda):
+    # Tempo de comprimir + transmitir + descomprimir `tamanho` bytes num enlace de `banda` bytes/s
+    return (tamanho / medida["comprimir"] + tamanho / medida["razao"] / banda
+            + tamanho / medida["descomprimir"])
+
+def escolher_codec(medidas, tamanho, banda):
+    # Codec que minimiza o tempo total de transferência para o enlace medido
+    return min(medidas, key=lambda nome: estimar_tempo(medidas[nome], tamanho, banda))
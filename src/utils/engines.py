@@ -0,0 +1,212 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .hash_check import save_hash
+from .timer import TemporizadorSimples, adicionar_log, agora_ts, formatar_notas
+from .ordered_writer import escrever_matriz
+from .formatting import formatar_truncado
+from .ponto_fixo import formatar_produto, para_ponto_fixo, verificar_overflow_entradas
+
+# Engines: formas de calcular C = A @ B no processo local, escolhidas com --engine no
+# linear.py e no parallel_local.py. Com várias engines na mesma execução, cada uma é
+# medida e registrada numa linha do run_logs.csv (engine=... nas notas), para compará-las.
+# As engines com Numba, BLAS e memória compartilhada importam seus módulos só quando
+# usadas: o linear.py com a engine python não carrega Numba nem multiprocessing.
+
+ORDENS_NUMBA = ("ikj", "ijk")
+
+def multiplicacao_linear_for(matA, matB, zero=0.0):
+    # Multiplicação de matrizes usando loops for
+    # zero=0 mantém as somas em int do Python (modo exato, sem limite de tamanho)
+    num_linhas = len(matA)
+    num_colunas = len(matB[0])
+    num_elem = len(matB)
+    resultado = [[zero for _ in range(num_colunas)] for _ in range(num_linhas)]
+    for i in range(num_linhas): 
+        for j in range(num_colunas):
+            for k in range(num_elem):
+                resultado[i][j] += matA[i][k] * matB[k][j]
+    return resultado
+
+def multiplicar_linha(args):
+    # Calcula produto de uma linha da matriz A com a matriz B
+    # zero=0 mantém as somas em int do Python (modo exato)
+    idx, linha, matrizB, zero = args
+    num_colunas = len(matrizB[0])
+    num_elem = len(matrizB)
+    resultado_linha = [zero for _ in range(num_colunas)]
+    for j in range(num_colunas):
+        for k in range(num_elem):
+            resultado_linha[j] += linha[k] * matrizB[k][j]
+    return (idx, resultado_linha)
+
+
+def multiplicacao_paralela_local(matA, matB, num_workers, zero=0.0):
+    # Multiplicação de matrizes em paralelo usando ProcessPoolExecutor
+    # Cada processo calcula uma linha inteira da matriz C
+    n = len(matA)
+    matC = [[zero for _ in range(len(matB[0]))] for _ in range(n)]
+
+    # Mapeamento: Distribuir as subtarefas para os processos
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        
+        # Decomposição: Quebrar o problema em subtarefas independentes por linha
+        # Aglomeração: agrupar todos os elementos da mesma linha em uma única tarefa
+        argumentos = [(i, matA[i], matB, zero) for i in range(n)]
+        
+        # Comunicação: Distribuir as subtarefas entre os processos e recolher os resultados
+        for idx, linha_resultante in executor.map(multiplicar_linha, argumentos):
+            matC[idx] = linha_resultante
+
+    return matC
+
+class Engine:
+    # multiplicar(A, B, paralelismo, exato, **opcoes) -> C (float64, ou no modo exato
+    # inteiros em escala 10^8)
+    # entrada: "listas" (laços Python), "ndarray" (no modo exato já em ponto fixo int64)
+    #          ou "original" (recebe as matrizes como carregadas e converte sozinha)
+    # paralelismo: None (1 núcleo), "processos" (--workers) ou "threads" (--threads)
+    # jit: compilada pelo Numba na primeira chamada; aquecida antes da medição
+    # blas: as threads que valem são as do pool da BLAS, não as do Numba
+    # opcoes: argumentos da linha de comando repassados para multiplicar
+    def __init__(self, multiplicar, entrada="ndarray", paralelismo=None, jit=False,
+                 blas=False, exato=True, opcoes=()):
+        self.multiplicar = multiplicar
+        self.entrada = entrada
+        self.paralelismo = paralelismo
+        self.jit = jit
+        self.blas = blas
+        self.exato = exato
+        self.opcoes = opcoes
+
+def _memoria_compartilhada(A, B, p, exato):
+    from .memoria_compartilhada import multiplicacao_memoria_compartilhada
+    return multiplicacao_memoria_compartilhada(A, B, p, exato=exato)
+
+def _numba(A, B, p, exato, ordem="ikj", bloco=0):
+    from .kernels import multiplicar_numba_ordem
+    return multiplicar_numba_ordem(A, B, ordem, bloco)
+
+ENGINES = {
+    "python": Engine(lambda A, B, p, exato: multiplicacao_linear_for(A, B, zero=0 if exato else 0.0),
+                     entrada="listas"),
+    "processos": Engine(lambda A, B, p, exato: multiplicacao_paralela_local(A, B, p, zero=0 if exato else 0.0),
+                        entrada="listas", paralelismo="processos"),
+    "memoria_compartilhada": Engine(_memoria_compartilhada, entrada="original", paralelismo="processos"),
+    "numba": Engine(_numba, paralelismo="threads", jit=True, opcoes=("ordem", "bloco")),
+    # a BLAS só multiplica ponto flutuante
+    "blas": Engine(lambda A, B, p, exato: np.matmul(A, B), paralelismo="threads", blas=True, exato=False),
+}
+
+def adicionar_argumentos_engine(parser, padrao, threads_padrao, ajuda_threads):
+    parser.add_argument("--engine", nargs="+", choices=list(ENGINES), default=[padrao],
+                        help=f"Engine(s) de multiplicação (default: {padrao}); com mais de uma, "
+                             "todas rodam em sequência e cada uma gera uma linha no run_logs.csv")
+    parser.add_argument("--threads", type=int, default=threads_padrao,
+                        help=ajuda_threads)
+    parser.add_argument("--ordem", choices=ORDENS_NUMBA, default="ikj",
+                        help="Ordem dos laços da engine numba")
+    parser.add_argument("--bloco", type=int, default=0,
+                        help="Lado dos tiles da engine numba (0: sem blocagem)")
+
+def validar_engines(parser, args):
+    if args.exato:
+        sem_exato = [nome for nome in args.engine if not ENGINES[nome].exato]
+        if sem_exato:
+            parser.error(f"--exato não é suportado pela(s) engine(s) {', '.join(sem_exato)}")
+    if args.bloco < 0:
+        parser.error("--bloco deve ser >= 0")
+
+def preparar_entradas(engine, matA, matB, exato):
+    # Conversões fora da medição: ponto fixo (modo exato) e listas para os laços Python
+    if engine.entrada == "original":
+        return matA, matB
+    if exato:
+        verificar_overflow_entradas(matA, matB)
+        matA, matB = para_ponto_fixo(matA), para_ponto_fixo(matB)
+    if engine.entrada == "listas":
+        return matA.tolist(), matB.tolist()
+    return matA, matB
+
+def executar_engine(nome, matA, matB, paralelismo, exato=False, **opcoes):
+    # Prepara as entradas, aquece o JIT e mede só a multiplicação.
+    # Retorna C, tempo_clock, tempo_cpu e os campos da engine para as notas do run_logs.csv
+    engine = ENGINES[nome]
+    opcoes = {chave: opcoes[chave] for chave in engine.opcoes if chave in opcoes}
+    if engine.blas:
+        # registra as threads que a BLAS usa de fato (ela pode ter um máximo próprio);
+        # as threads do Numba não são iniciadas
+        from .kernels import limitar_blas
+        paralelismo = limitar_blas(paralelismo)
+    elif engine.paralelismo == "threads":
+        from .kernels import definir_threads
+        paralelismo = definir_threads(paralelismo)
+    elif engine.paralelismo is None:
+        paralelismo = 1
+
+    temporizador = TemporizadorSimples()
+    temporizador.iniciar()
+    A, B = preparar_entradas(engine, matA, matB, exato)
+    tempo_preparo, _ = temporizador.parar()
+
+    tempo_aquecimento = 0.0
+    if engine.jit:
+        # Compila para os mesmos tipos (dtype, layout C) fora da medição
+        temporizador.iniciar()
+        engine.multiplicar(np.ascontiguousarray(A[:2, :2]), np.ascontiguousarray(B[:2, :2]),
+                           paralelismo, exato, **opcoes)
+        tempo_aquecimento, _ = temporizador.parar()
+
+    temporizador.iniciar()
+    matC = engine.multiplicar(A, B, paralelismo, exato, **opcoes)
+    tempo_clock, tempo_cpu = temporizador.parar()
+
+    notas = dict(engine=nome, **opcoes, preparo=f"{tempo_preparo:.3f}")
+    if engine.jit:
+        notas["aquecimento"] = f"{tempo_aquecimento:.3f}"
+    return matC, paralelismo, tempo_clock, tempo_cpu, notas
+
+def executar_engines(args, matA, matB, modo, paralelismos, path_matC, tempo_carga, cache=None, chave=None):
+    # Roda cada engine de args.engine, grava matC.txt/hash.txt e registra uma linha no
+    # run_logs.csv por engine. paralelismos: {"processos": workers, "threads": threads}.
+    # Retorna [(engine, tempo_clock, hash)].
+    # Engines de processos rodam antes das de threads: criar processos (fork) depois que
+    # o Numba iniciou suas threads (TBB) trava o processo principal ao terminar
+    resultados = []
+    for nome in sorted(args.engine, key=lambda nome: ENGINES[nome].paralelismo == "threads"):
+        matC, paralelismo, tempo_clock, tempo_cpu, notas_engine = executar_engine(
+            nome, matA, matB, paralelismos.get(ENGINES[nome].paralelismo, 1), args.exato,
+            ordem=args.ordem, bloco=args.bloco)
+
+        # Salvar matriz resultante calculando o hash durante a escrita
+        h = escrever_matriz(path_matC, matC, formatar_produto if args.exato else formatar_truncado)
+        save_hash(h, f"{args.outdir}/hash.txt")
+        if cache is not None and not resultados:
+            cache.guardar(chave, path_matC, h)
+        del matC
+
+        # Salvar log (num_processos: workers ou threads da engine)
+        cabecalho = ["modo","num_processos","tempo_clock","tempo_cpu","tempo_comunicacao","tempo_total","timestamp","notas"]
+        notas = formatar_notas(carga=f"{tempo_carga:.3f}", dims=f"{len(matA)}x{len(matB)}x{len(matB[0])}",
+                               exato=int(args.exato), cache="off" if cache is None else "miss", **notas_engine)
+        linha_log = [modo, paralelismo, f"{tempo_clock:.6f}", f"{tempo_cpu:.6f}", 0.0, f"{tempo_clock:.6f}", agora_ts(), notas]
+        adicionar_log(f"{args.outdir}/run_logs.csv", linha_log, cabecalho)
+
+        print(f"Engine {nome} ({paralelismo} {ENGINES[nome].paralelismo or 'núcleo'}):")
+        if "aquecimento" in notas_engine:
+            print(f"\tAquecimento do JIT: {notas_engine['aquecimento']}s (fora da medição)")
+        print("\tTempo (clock):", tempo_clock, "CPU:", tempo_cpu)
+        horas = int(tempo_clock // 3600)
+        minutos = int((tempo_clock % 3600) // 60)
+        segundos = tempo_clock % 60
+        print(f"\tTempo real: {horas}h {minutos}min {segundos:.2f}s")
+        print("\tHash:", h)
+        resultados.append((nome, tempo_clock, h))
+
+    if len(resultados) > 1:
+        print(f"\n{'engine':<24}{'tempo(s)':>12}  hash")
+        for nome, tempo_clock, h in sorted(resultados, key=lambda r: r[1]):
+            print(f"{nome:<24}{tempo_clock:>12.4f}  {h[:16]}")
+        if len({h for _, _, h in resultados}) > 1:
+            print("Aviso: hashes diferentes entre engines (a ordem das somas em float muda o "
+                  "truncamento; com --exato o hash é o mesmo em todas).")
+    return resultados
@@ -0,0 +1,58 @@
+import numpy as np
+
+# Truncamento para 4 casas decimais e formatação do matC.txt, vetorizados com NumPy.
+# Todos os modos (linear, paralelo local e distribuído) usam estas funções, então
+# o mesmo C gera exatamente os mesmos bytes (e o mesmo hash) em qualquer modo.
+ESCALA = 10000
+# Versão do formato do matC.txt; faz parte da chave do cache de resultados
+# (utils.cache_resultados), então deve mudar junto com qualquer mudança de formato
+VERSAO_FORMATO = 1
+
+def truncar_inteiros(matriz):
+    # Valores truncados (sem arredondar) e escalados por 10^4, como int64.
+    # O cast para inteiro trunca em direção a zero, igual a int(valor * 10000).
+    return (np.asarray(matriz, dtype=np.float64) * ESCALA).astype(np.int64)
+
+def truncar_4digitos(matriz):
+    # Trunca valores da matriz para 4 casas decimais sem arredondar
+    return truncar_inteiros(matriz) / ESCALA
+
+def formatar_inteiros(t):
+    # Formata uma matriz de inteiros escalados por 10^4 como texto do matC.txt:
+    # "%.4f" de cada valor, separados por espaço, linhas separadas por "\n"
+    # (sem "\n" no final). Monta todos os caracteres numa matriz uint8 de largura
+    # fixa por valor e remove as posições não usadas (byte 0), sem laço Python
+    # por elemento. Retorna bytes.
+    t = np.atleast_2d(np.asarray(t, dtype=np.int64))
+    if t.size == 0:
+        return b""
+    negativo = t < 0
+    absoluto = np.abs(t)
+    parte_inteira = absoluto // ESCALA
+    parte_fracionaria = absoluto % ESCALA
+
+    num_digitos = len(str(int(parte_inteira.max())))
+    digitos_usados = np.ones(t.shape, dtype=np.int64)
+    for d in range(1, num_digitos):
+        digitos_usados += parte_inteira >= 10 ** d
+
+    # sinal | dígitos da parte inteira | "." | 4 dígitos | separador
+    largura = 1 + num_digitos + 1 + 4 + 1
+    buf = np.zeros(t.shape + (largura,), dtype=np.uint8)
+    buf[..., 0] = np.where(negativo, ord("-"), 0)
+    for d in range(num_digitos):
+        digito = (parte_inteira // 10 ** (num_digitos - 1 - d)) % 10
+        buf[..., 1 + d] = np.where(num_digitos - d <= digitos_usados, ord("0") + digito, 0)
+    buf[..., 1 + num_digitos] = ord(".")
+    for d in range(4):
+        buf[..., 2 + num_digitos + d] = ord("0") + (parte_fracionaria // 10 ** (3 - d)) % 10
+    buf[..., -1] = ord(" ")
+    buf[:, -1, -1] = ord("\n")
+    buf[-1, -1, -1] = 0
+
+    plano = buf.reshape(-1)
+    return plano[plano != 0].tobytes()
+
+def formatar_truncado(bloco):
+    # Trunca e formata um bloco de linhas de C (formatador padrão do matC.txt)
+    return formatar_inteiros(truncar_inteiros(bloco))
@@ -12,4 +12,7 @@ def save_hash(hash_hex, outpath):
     out = Path(outpath)
     out.parent.mkdir(parents=True, exist_ok=True)
     with open(out, "w", encoding="utf8") as f:
-        f.write(hash_hex + "\n")
\ No newline at end of file
+        f.write(hash_hex + "\n")
+
+def sha256_of_bytes(data):
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,148 @@
+import numpy as np
+import numba
+from numba import njit, prange
+from threadpoolctl import threadpool_info, threadpool_limits
+from .ponto_fixo import verificar_overflow
+
+# Kernels de multiplicação sobre ndarrays contíguos, usados pelos backends e pelo
+# modo local. Todos recebem A (n x p) e B (p x m) e retornam C (n x m), float64 ou
+# int64 no modo exato (ponto fixo, ver utils.ponto_fixo): o Numba compila uma versão
+# por dtype dos mesmos laços.
+
+def multiplicar_blas(A, B, bloco=None):
+    # Delega para o GEMM da biblioteca BLAS do NumPy (OpenBLAS/MKL), já multi-thread
+    return np.matmul(A, B)
+
+# Laços do Numba, usados pela engine "numba" do modo local (--engine numba) e pelos
+# kernels dos backends abaixo: C (já zerada, float64 ou int64 no modo exato) += A @ B,
+# com as linhas de C divididas entre as threads (prange). A ordem dos laços muda o acesso
+# à memória: i-k-j percorre B e C por linha (contíguo); i-j-k faz o produto escalar de
+# uma linha de A com uma coluna de B (B lida com salto de m elementos). Com bloco > 0,
+# A e B são percorridas em tiles bloco x bloco, reaproveitando o tile de B na cache.
+@njit(parallel=True, fastmath=True, cache=True)
+def _numba_ikj(A, B, C):
+    n, p = A.shape
+    m = B.shape[1]
+    for i in prange(n):
+        for k in range(p):
+            a = A[i, k]
+            for j in range(m):
+                C[i, j] += a * B[k, j]
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _numba_ijk(A, B, C):
+    n, p = A.shape
+    m = B.shape[1]
+    for i in prange(n):
+        for j in range(m):
+            s = C[i, j]
+            for k in range(p):
+                s += A[i, k] * B[k, j]
+            C[i, j] = s
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _numba_ikj_blocos(A, B, C, bloco):
+    n, p = A.shape
+    m = B.shape[1]
+    for t in prange((n + bloco - 1) // bloco):
+        i0 = t * bloco
+        i1 = min(i0 + bloco, n)
+        for k0 in range(0, p, bloco):
+            k1 = min(k0 + bloco, p)
+            for j0 in range(0, m, bloco):
+                j1 = min(j0 + bloco, m)
+                for i in range(i0, i1):
+                    for k in range(k0, k1):
+                        a = A[i, k]
+                        for j in range(j0, j1):
+                            C[i, j] += a * B[k, j]
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _numba_ijk_blocos(A, B, C, bloco):
+    n, p = A.shape
+    m = B.shape[1]
+    for t in prange((n + bloco - 1) // bloco):
+        i0 = t * bloco
+        i1 = min(i0 + bloco, n)
+        for j0 in range(0, m, bloco):
+            j1 = min(j0 + bloco, m)
+            for k0 in range(0, p, bloco):
+                k1 = min(k0 + bloco, p)
+                for i in range(i0, i1):
+                    for j in range(j0, j1):
+                        s = C[i, j]
+                        for k in range(k0, k1):
+                            s += A[i, k] * B[k, j]
+                        C[i, j] = s
+
+# ordem dos laços -> (kernel sem blocagem, kernel com blocagem)
+KERNELS_ORDEM = {"ikj": (_numba_ikj, _numba_ikj_blocos), "ijk": (_numba_ijk, _numba_ijk_blocos)}
+
+def multiplicar_numba_ordem(matA, matB, ordem="ikj", bloco=0):
+    # Multiplicação com Numba (prange) nas threads definidas por set_num_threads
+    A = np.ascontiguousarray(matA)
+    B = np.ascontiguousarray(matB)
+    C = np.zeros((A.shape[0], B.shape[1]), dtype=np.result_type(A, B))
+    simples, blocado = KERNELS_ORDEM[ordem]
+    if bloco > 0:
+        blocado(A, B, C, bloco)
+    else:
+        simples(A, B, C)
+    return C
+
+def multiplicar_numba(A, B, bloco=None):
+    # Ordem i-k-j sem blocagem: acesso contíguo a B e ao resultado
+    return multiplicar_numba_ordem(A, B)
+
+def multiplicar_numba_paralelo(A, B, bloco=64):
+    # Ordem i-k-j com blocagem para cache: cada thread (prange) fica com uma faixa de
+    # `bloco` linhas de C e reaproveita o tile de B enquanto ele está na cache
+    return multiplicar_numba_ordem(A, B, bloco=bloco)
+
+def multiplicar_exato(A, B, bloco=64):
+    # Kernel do modo exato: confere o risco de overflow antes de multiplicar. A soma
+    # inteira é exata, então a divisão em faixas e tiles não altera o resultado
+    verificar_overflow(A, B)
+    return multiplicar_numba_paralelo(A, B, bloco)
+
+KERNELS = {
+    "numba": multiplicar_numba,
+    "numba-paralelo": multiplicar_numba_paralelo,
+    "blas": multiplicar_blas,
+    "inteiro": multiplicar_exato,
+}
+
+_avisos = set()
+
+def _avisar_uma_vez(mensagem):
+    if mensagem not in _avisos:
+        _avisos.add(mensagem)
+        print(mensagem)
+
+def threads_blas():
+    # Threads em uso pela BLAS carregada pelo NumPy (a menor, se houver mais de uma);
+    # None se nenhuma BLAS foi detectada
+    contagens = [info["num_threads"] for info in threadpool_info() if info.get("user_api") == "blas"]
+    return min(contagens) if contagens else None
+
+def limitar_blas(num_threads):
+    # Ajusta as threads da BLAS e retorna quantas ela usa de fato
+    pedido = max(1, num_threads)
+    threadpool_limits(limits=pedido, user_api="blas")
+    blas = threads_blas()
+    if blas is not None and blas != pedido:
+        _avisar_uma_vez(f"Aviso: {pedido} threads pedidas, mas a BLAS usa {blas}.")
+    return blas or pedido
+
+def definir_threads(num_threads):
+    # Ajusta o número de threads do Numba e da BLAS e retorna quantas o Numba usa.
+    # O Numba não passa de NUMBA_NUM_THREADS (fixado ao carregá-lo; default: núcleos)
+    # e a BLAS pode ter um máximo próprio: nos dois casos o aviso sai uma vez só.
+    pedido = max(1, num_threads)
+    num_threads = min(pedido, numba.config.NUMBA_NUM_THREADS)
+    if num_threads < pedido:
+        _avisar_uma_vez(f"Aviso: {pedido} threads pedidas, mas NUMBA_NUM_THREADS="
+                        f"{numba.config.NUMBA_NUM_THREADS}; o Numba usa {num_threads}.")
+    numba.set_num_threads(num_threads)
+    limitar_blas(pedido)
+    return num_threads
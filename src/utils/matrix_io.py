@@ -0,0 +1,183 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+import numpy as np
+from .formatting import ESCALA, formatar_inteiros
+
+# Leitura e escrita das matrizes de entrada em dois formatos:
+#   .txt — formato exigido pelo trabalho (valores com 4 casas separados por espaço)
+#   .npy — formato binário do NumPy: cabeçalho com shape/dtype + dados float64
+#          little-endian brutos, que pode ser aberto com memory-map (np.load(mmap_mode="r"))
+#          sem carregar a matriz inteira na memória
+FORMATOS = ("auto", "txt", "npy")
+DTYPE = np.dtype("<f8")
+
+def localizar_matriz(matdir, nome, formato="auto"):
+    # Caminho de uma matriz (ex.: nome="matA") no formato pedido;
+    # "auto" prefere o .npy quando ele existe
+    txt = Path(matdir) / f"{nome}.txt"
+    npy = Path(matdir) / f"{nome}.npy"
+    if formato == "npy" or (formato == "auto" and npy.exists()):
+        return npy
+    return txt
+
+def carregar_matriz(caminho, mmap=True, workers=None):
+    # .npy é aberto com memory-map (somente leitura): as linhas só são lidas do
+    # disco quando usadas. .txt é lido pelo parser paralelo para um ndarray float64.
+    caminho = Path(caminho)
+    if caminho.suffix == ".npy":
+        return np.load(caminho, mmap_mode="r" if mmap else None)
+    return carregar_texto_paralelo(caminho, workers)
+
+def forma_matriz(caminho, bytes_por_faixa=64 * 1024 * 1024):
+    # (linhas, colunas) sem carregar a matriz: cabeçalho do .npy, ou contagem
+    # de quebras de linha do .txt (lido em faixas de tamanho limitado)
+    caminho = Path(caminho)
+    if caminho.suffix == ".npy":
+        return tuple(np.load(caminho, mmap_mode="r").shape)
+    num_partes = max(1, -(-os.path.getsize(caminho) // bytes_por_faixa))
+    _, num_linhas = _dividir_em_linhas(str(caminho), num_partes)
+    with open(caminho, "rb") as f:
+        num_colunas = len(f.readline().split())
+    return num_linhas, num_colunas
+
+def _dividir_em_linhas(caminho, num_partes):
+    # Divide o arquivo em faixas de bytes que começam e terminam em fim de linha.
+    # Retorna [(byte_inicio, byte_fim, linha_inicial, num_linhas)], contando as
+    # quebras de linha de cada faixa para saber onde cada uma começa na matriz.
+    tamanho = os.path.getsize(caminho)
+    alvo = max(1, -(-tamanho // num_partes))
+    faixas = []
+    linha = 0
+    with open(caminho, "rb") as f:
+        inicio = 0
+        while inicio < tamanho:
+            fim = min(inicio + alvo, tamanho)
+            f.seek(fim)
+            # avança até o próximo "\n" para não cortar uma linha ao meio
+            while fim < tamanho:
+                pedaco = f.read(65536)
+                if not pedaco:
+                    fim = tamanho
+                    break
+                pos = pedaco.find(b"\n")
+                if pos >= 0:
+                    fim += pos + 1
+                    break
+                fim += len(pedaco)
+            f.seek(inicio)
+            dados = f.read(fim - inicio)
+            num_linhas = dados.count(b"\n")
+            if fim == tamanho and dados.strip() and not dados.endswith(b"\n"):
+                num_linhas += 1
+            faixas.append((inicio, fim, linha, num_linhas))
+            linha += num_linhas
+            inicio = fim
+    return faixas, linha
+
+def _ler_faixa(dados):
+    return np.loadtxt(io.BytesIO(dados), dtype=np.float64, ndmin=2)
+
+def _ler_faixa_compartilhada(args):
+    # Worker: lê sua faixa de bytes e escreve as linhas direto na matriz de saída
+    # (memória compartilhada), sem devolver dados pelo pool
+    caminho, inicio, fim, linha, num_linhas, nome_shm, forma = args
+    with open(caminho, "rb") as f:
+        f.seek(inicio)
+        bloco = _ler_faixa(f.read(fim - inicio))
+    if bloco.shape != (num_linhas, forma[1]):
+        raise ValueError(f"{caminho}: linhas {linha}..{linha + num_linhas} com formato "
+                         f"{bloco.shape}, esperado ({num_linhas}, {forma[1]})")
+    shm = shared_memory.SharedMemory(name=nome_shm)
+    try:
+        np.ndarray(forma, dtype=np.float64, buffer=shm.buf)[linha:linha + num_linhas] = bloco
+        del bloco
+    finally:
+        shm.close()
+    return num_linhas
+
+def carregar_texto_paralelo(caminho, workers=None, tamanho_minimo=8 * 1024 * 1024):
+    # Carrega uma matriz .txt dividindo o arquivo em faixas de linhas e lendo as
+    # faixas em processos paralelos direto para um float64 pré-alocado.
+    # Arquivos pequenos são lidos no próprio processo.
+    caminho = str(caminho)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or os.path.getsize(caminho) < tamanho_minimo:
+        with open(caminho, "rb") as f:
+            return _ler_faixa(f.read())
+
+    faixas, num_linhas = _dividir_em_linhas(caminho, workers * 4)
+    with open(caminho, "rb") as f:
+        num_colunas = len(f.readline().split())
+    forma = (num_linhas, num_colunas)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, num_linhas * num_colunas * 8))
+    try:
+        tarefas = [(caminho, inicio, fim, linha, n, shm.name, forma)
+                   for inicio, fim, linha, n in faixas if n > 0]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(_ler_faixa_compartilhada, tarefas):
+                pass
+        matriz = np.ndarray(forma, dtype=np.float64, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return matriz
+
+def salvar_npy(caminho, matriz):
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    np.save(caminho, np.ascontiguousarray(matriz, dtype=DTYPE))
+
+def criar_npy(caminho, forma):
+    # Cria um .npy vazio já no tamanho final, para ser preenchido em blocos
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    return np.lib.format.open_memmap(caminho, mode="w+", dtype=DTYPE, shape=forma)
+
+def salvar_txt(caminho, matriz, linhas_por_bloco=1024):
+    # Grava no formato .txt de entrada (4 casas, arredondado como f"{v:.4f}")
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "wb") as f:
+        for inicio in range(0, matriz.shape[0], linhas_por_bloco):
+            bloco = np.asarray(matriz[inicio:inicio + linhas_por_bloco], dtype=np.float64)
+            if inicio > 0:
+                f.write(b"\n")
+            f.write(formatar_inteiros(np.rint(bloco * ESCALA).astype(np.int64)))
+
+def texto_para_npy(origem, destino, bytes_por_faixa=64 * 1024 * 1024):
+    # Converte .txt -> .npy lendo uma faixa de linhas por vez direto para o .npy
+    # (memory-map), sem ter a matriz inteira em memória
+    origem = str(origem)
+    num_partes = max(1, -(-os.path.getsize(origem) // bytes_por_faixa))
+    faixas, num_linhas = _dividir_em_linhas(origem, num_partes)
+    with open(origem, "rb") as f:
+        num_colunas = len(f.readline().split())
+    saida = criar_npy(destino, (num_linhas, num_colunas))
+    with open(origem, "rb") as f:
+        for inicio, fim, linha, n in faixas:
+            if n == 0:
+                continue
+            f.seek(inicio)
+            saida[linha:linha + n] = _ler_faixa(f.read(fim - inicio))
+    saida.flush()
+    forma = saida.shape
+    del saida
+    return forma
+
+def converter(origem, destino):
+    # Converte entre .txt e .npy conforme as extensões
+    origem, destino = Path(origem), Path(destino)
+    if origem.suffix == ".txt" and destino.suffix == ".npy":
+        return texto_para_npy(origem, destino)
+    matriz = carregar_matriz(origem)
+    if destino.suffix == ".npy":
+        salvar_npy(destino, matriz)
+    elif destino.suffix == ".txt":
+        salvar_txt(destino, matriz)
+    else:
+        raise ValueError(f"Extensão não suportada: {destino.suffix} (use .txt ou .npy)")
+    return matriz.shape
@@ -0,0 +1,111 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numba
+import numpy as np
+from threadpoolctl import threadpool_limits
+from .kernels import multiplicar_numba
+from .ponto_fixo import para_ponto_fixo, verificar_overflow_entradas
+
+# Engine "memoria_compartilhada" do modo local (default do parallel_local.py): A, B e C
+# em multiprocessing.shared_memory (ou .npy com memory-map) e um pool de processos que
+# calcula tiles de C recebendo só os índices de cada tile.
+
+# Matrizes compartilhadas de cada worker (preenchidas pelo inicializador do pool)
+_compartilhadas = {}
+
+def _criar_compartilhada(forma, origem=None, dtype=np.float64):
+    # Cria um bloco de memória compartilhada com espaço para um ndarray float64
+    # (ou int64 no modo exato)
+    tamanho = max(1, int(np.prod(forma)) * 8)
+    shm = shared_memory.SharedMemory(create=True, size=tamanho)
+    if origem is not None:
+        np.ndarray(forma, dtype=dtype, buffer=shm.buf)[:] = origem
+    return shm
+
+def _anexar_compartilhadas(descritores):
+    # Inicializador do pool: cada worker anexa A, B e C uma única vez.
+    # "shm": bloco de memória compartilhada (por nome)
+    # "arquivo": .npy aberto com memory-map direto pelo worker (sem cópia)
+    # O paralelismo é entre workers: a BLAS de cada um fica com 1 thread, senão N
+    # workers disputariam os núcleos com N x núcleos threads.
+    threadpool_limits(limits=1, user_api="blas")
+    for chave, (tipo, origem, offset, forma, dtype) in descritores.items():
+        if tipo == "arquivo":
+            _compartilhadas[chave] = (None, np.memmap(origem, dtype=dtype, mode="r",
+                                                      offset=offset, shape=forma))
+        else:
+            shm = shared_memory.SharedMemory(name=origem)
+            _compartilhadas[chave] = (shm, np.ndarray(forma, dtype=dtype, buffer=shm.buf))
+    if _compartilhadas["C"][1].dtype.kind == "i":
+        # modo exato: pelo mesmo motivo, o kernel int64 do Numba também fica com 1 thread
+        numba.set_num_threads(1)
+
+def _descritor_arquivo(matriz):
+    # Se a matriz é um .npy float64 aberto com memory-map, os workers podem abrir
+    # o mesmo arquivo em vez de receber uma cópia em memória compartilhada
+    if (isinstance(matriz, np.memmap) and matriz.filename and matriz.dtype == np.dtype("<f8")
+            and matriz.flags.c_contiguous):
+        return ("arquivo", matriz.filename, matriz.offset, matriz.shape, "<f8")
+    return None
+
+def multiplicar_tile(tile):
+    # Calcula um tile de C = A[i0:i1, :] @ B[:, j0:j1] direto na memória compartilhada
+    # A tarefa recebe apenas índices; nenhuma matriz é copiada por tarefa
+    i0, i1, j0, j1 = tile
+    A = _compartilhadas["A"][1]
+    B = _compartilhadas["B"][1]
+    C = _compartilhadas["C"][1]
+    if C.dtype.kind == "i":
+        # modo exato: a BLAS não trabalha com inteiros; kernel int64 do Numba
+        C[i0:i1, j0:j1] = multiplicar_numba(A[i0:i1, :], np.ascontiguousarray(B[:, j0:j1]))
+    else:
+        np.matmul(A[i0:i1, :], B[:, j0:j1], out=C[i0:i1, j0:j1])
+    return tile
+
+def gerar_tiles(n, m, tile):
+    # Decomposição em tiles de linhas x colunas de C, em ordem de linhas
+    return [(i, min(i + tile, n), j, min(j + tile, m))
+            for i in range(0, n, tile)
+            for j in range(0, m, tile)]
+
+def multiplicacao_memoria_compartilhada(matA, matB, num_workers, tile=256, exato=False):
+    # Multiplicação em paralelo com A, B e C em multiprocessing.shared_memory
+    # Cada tarefa é um tile (i0, i1, j0, j1) de C; os workers leem A e B e
+    # escrevem C na memória compartilhada, sem serializar matrizes por tarefa.
+    # A e B vindas de .npy com memory-map são abertas direto do arquivo pelos workers.
+    # exato=True: A e B em ponto fixo int64 e C em escala 10^8 (utils.ponto_fixo)
+    n, m = len(matA), len(matB[0])
+    dtype = np.int64 if exato else np.float64
+    if exato:
+        verificar_overflow_entradas(matA, matB)
+
+    blocos = []
+    try:
+        descritores = {}
+        for chave, matriz in (("A", matA), ("B", matB)):
+            descritor = None if exato else _descritor_arquivo(matriz)
+            if descritor is None:
+                matriz = para_ponto_fixo(matriz) if exato else np.asarray(matriz, dtype=np.float64)
+                shm = _criar_compartilhada(matriz.shape, matriz, dtype)
+                blocos.append(shm)
+                descritor = ("shm", shm.name, 0, matriz.shape, np.dtype(dtype).str)
+            descritores[chave] = descritor
+        shmC = _criar_compartilhada((n, m), dtype=dtype)
+        blocos.append(shmC)
+        descritores["C"] = ("shm", shmC.name, 0, (n, m), np.dtype(dtype).str)
+        tiles = gerar_tiles(n, m, tile)
+        with ProcessPoolExecutor(max_workers=num_workers,
+                                 initializer=_anexar_compartilhadas,
+                                 initargs=(descritores,)) as executor:
+            # chunksize agrupa vários tiles por mensagem para reduzir o IPC
+            chunksize = max(1, len(tiles) // (num_workers * 4))
+            for _ in executor.map(multiplicar_tile, tiles, chunksize=chunksize):
+                pass
+
+        matC = np.ndarray((n, m), dtype=dtype, buffer=shmC.buf).copy()
+    finally:
+        for shm in blocos:
+            shm.close()
+            shm.unlink()
+
+    return matC
@@ -0,0 +1,177 @@
+import csv
+import statistics
+from pathlib import Path
+from .timer import adicionar_log, agora_ts
+
+# Modelo de custo dos três modos, usado pelo auto.py para escolher modo e número de
+# workers/backends. As previsões são do tempo_clock que cada modo registra no
+# run_logs.csv (só a multiplicação, sem carga nem escrita do matC.txt):
+#   linear          OPS * n*k*m / operações escalares por segundo do Python
+#   paralelo_local  2nkm / GFLOPS(w threads) + cópias para a memória compartilhada
+#                   (banda STREAM) + criação dos workers
+#   distribuido     2nkm / soma dos GFLOPS dos backends + B para cada backend, A e C
+#                   pela rede do cliente + cópias de codificação/decodificação dos
+#                   buffers do wire (banda STREAM copy de 1 thread) + abertura das sessões
+# As capacidades vêm do results/benchmarks.csv (benchmark.py) e cada modo tem um
+# fator de correção: a mediana de real/previsto das execuções anteriores no run_logs.csv.
+
+MODOS = ("linear", "paralelo_local", "distribuido")
+# Engine de cada modo que o modelo descreve; execuções com outra --engine não calibram
+ENGINE_PADRAO = {"linear": "python", "paralelo_local": "memoria_compartilhada"}
+
+# Valores usados quando o benchmarks.csv não tem a medida (ordem de grandeza de um desktop)
+PADROES = {"ops_escalares": 3e7, "gflops_nucleo": 5.0, "banda_memoria_gb_s": 5.0,
+           "copia_gb_s": 10.0}
+REDE_PADRAO_MB_S = 100.0
+# Operações do Python por iteração do laço mais interno do linear (índices, multiplicação, soma)
+OPS_POR_ITERACAO_LINEAR = 4
+# Custos fixos: criação de um worker do pool e abertura de sessão/envio inicial por backend
+CUSTO_WORKER_S = 0.05
+CUSTO_BACKEND_S = 0.05
+
+def _threads(notas):
+    for campo in (notas or "").split(";"):
+        chave, _, valor = campo.partition("=")
+        if chave == "threads":
+            return int(valor)
+    return None
+
+def ler_capacidades(caminho_csv, host):
+    # Medidas mais recentes de `host` no benchmarks.csv (linhas posteriores substituem
+    # as anteriores). "padrao" lista as capacidades que ficaram com o valor de PADROES.
+    cap = {"gflops_threads": {}}
+    banda = {}
+    copia = {}
+    p = Path(caminho_csv)
+    if p.exists():
+        with open(p, newline="", encoding="utf8") as f:
+            for linha in csv.DictReader(f):
+                if linha.get("host") != host:
+                    continue
+                try:
+                    valor = float(linha["value"])
+                except (TypeError, ValueError):
+                    continue
+                secao, metrica = linha.get("section"), linha.get("metric")
+                if secao == "scalar" and metrica == "float_ops_per_s":
+                    cap["ops_escalares"] = valor
+                elif secao == "gemm" and linha.get("dtype") == "float64":
+                    cap["gflops_nucleo"] = valor
+                elif secao == "gemm_threads":
+                    cap["gflops_threads"][_threads(linha.get("notes")) or 1] = valor
+                elif secao == "stream" and metrica == "triad_gb_s":
+                    banda[_threads(linha.get("notes")) or 1] = valor
+                elif secao == "stream" and metrica == "copy_gb_s":
+                    copia[_threads(linha.get("notes")) or 1] = valor
+    if banda:
+        cap["banda_memoria_gb_s"] = banda[max(banda)]
+    if copia:
+        # codificar_array/decodificar_array copiam os buffers numa thread só
+        cap["copia_gb_s"] = copia[min(copia)]
+    if "gflops_nucleo" not in cap and 1 in cap["gflops_threads"]:
+        cap["gflops_nucleo"] = cap["gflops_threads"][1]
+    cap["padrao"] = [nome for nome in PADROES if nome not in cap]
+    for nome in cap["padrao"]:
+        cap[nome] = PADROES[nome]
+    return cap
+
+def gflops_com_threads(cap, threads):
+    # GFLOPS medido com `threads` threads; sem essa medida, escala linearmente a
+    # maior contagem medida abaixo dela (ou o GEMM de 1 núcleo)
+    medidos = cap["gflops_threads"]
+    if threads in medidos:
+        return medidos[threads]
+    abaixo = [k for k in medidos if k < threads]
+    if abaixo:
+        k = max(abaixo)
+        return medidos[k] * threads / k
+    return cap["gflops_nucleo"] * threads
+
+class ModeloCusto:
+    # gflops_backends: GFLOPS de cada backend disponível, na ordem em que serão usados
+    # rede_mb_s: banda medida entre o cliente e os backends
+    def __init__(self, capacidades, gflops_backends=(), rede_mb_s=REDE_PADRAO_MB_S):
+        self.cap = capacidades
+        self.gflops_backends = list(gflops_backends)
+        self.rede = rede_mb_s * 1e6
+        self.fatores = {modo: 1.0 for modo in MODOS}
+        self.amostras = {modo: 0 for modo in MODOS}
+
+    def _gflops_distribuido(self, p):
+        # Com histórico de mais backends do que os disponíveis agora, os que faltam
+        # valem a média dos conhecidos
+        conhecidos = self.gflops_backends[:p]
+        media = sum(self.gflops_backends) / len(self.gflops_backends) if self.gflops_backends \
+            else self.cap["gflops_nucleo"]
+        return sum(conhecidos) + media * (p - len(conhecidos))
+
+    def bruto(self, modo, dims, p):
+        n, k, m = dims
+        if modo == "linear":
+            return OPS_POR_ITERACAO_LINEAR * n * k * m / self.cap["ops_escalares"]
+        bytes_A, bytes_B, bytes_C = 8 * n * k, 8 * k * m, 8 * n * m
+        if modo == "paralelo_local":
+            calculo = 2.0 * n * k * m / (gflops_com_threads(self.cap, p) * 1e9)
+            copias = (bytes_A + bytes_B + bytes_C) / (self.cap["banda_memoria_gb_s"] * 1e9)
+            return calculo + copias + CUSTO_WORKER_S * p
+        if modo == "distribuido":
+            calculo = 2.0 * n * k * m / (self._gflops_distribuido(p) * 1e9)
+            rede = (p * bytes_B + bytes_A + bytes_C) / self.rede
+            # B codificada no cliente e decodificada nos backends (em paralelo), A e C uma
+            # vez cada; o STREAM copy conta leitura + escrita, 2 bytes por byte copiado
+            copias = 2 * (2 * bytes_B + bytes_A + bytes_C) / (self.cap["copia_gb_s"] * 1e9)
+            return calculo + rede + copias + CUSTO_BACKEND_S * p
+        raise ValueError(f"Modo desconhecido: {modo}")
+
+    def prever(self, modo, dims, p):
+        return self.bruto(modo, dims, p) * self.fatores[modo]
+
+    def calibrar(self, historico, ultimas=20):
+        # Fator de cada modo = mediana de real/bruto nas `ultimas` execuções do modo
+        for modo in MODOS:
+            razoes = [tempo / self.bruto(modo, dims, p)
+                      for m, p, dims, tempo in historico if m == modo and tempo > 0][-ultimas:]
+            if razoes:
+                self.fatores[modo] = statistics.median(razoes)
+                self.amostras[modo] = len(razoes)
+
+def _campos_notas(notas):
+    return dict(campo.partition("=")[::2] for campo in (notas or "").split(";") if campo)
+
+def ler_historico(caminho_run_logs):
+    # Execuções do run_logs.csv com dimensões registradas (dims=NxKxM nas notas):
+    # [(modo, processos, (n, k, m), tempo_clock)]. Acertos de cache, outras engines, o
+    # modo exato (int64, bem mais lento), o fora do núcleo (disco) e o distribuído em
+    # SUMMA ou em pipeline (outro volume e outra sobreposição de rede) não medem o modo
+    # como o modelo o descreve.
+    p = Path(caminho_run_logs)
+    if not p.exists():
+        return []
+    historico = []
+    with open(p, newline="", encoding="utf8") as f:
+        for linha in csv.DictReader(f):
+            notas = _campos_notas(linha.get("notas"))
+            if "dims" not in notas or notas.get("cache") == "hit":
+                continue
+            if notas.get("exato") == "1" or notas.get("fora_do_nucleo") == "1":
+                continue
+            if notas.get("engine", ENGINE_PADRAO.get(linha["modo"])) != ENGINE_PADRAO.get(linha["modo"]):
+                continue
+            if linha["modo"] == "distribuido" and (notas.get("modo", "linhas") != "linhas"
+                                                  or notas.get("pipeline", "0") != "0"):
+                continue
+            try:
+                dims = tuple(int(x) for x in notas["dims"].split("x"))
+                historico.append((linha["modo"], int(linha["num_processos"]), dims,
+                                  float(linha["tempo_clock"])))
+            except (KeyError, ValueError):
+                continue
+    return historico
+
+def registrar_previsao(caminho, modo, p, dims, previsto, bruto, fator, real):
+    # Previsto x real de cada execução escolhida pelo auto.py, para acompanhar o erro do modelo
+    cabecalho = ["timestamp", "modo", "processos", "dims", "previsto_s", "previsto_bruto_s",
+                 "fator", "real_s", "erro_relativo"]
+    adicionar_log(caminho, [agora_ts(), modo, p, "x".join(map(str, dims)), f"{previsto:.6f}",
+                            f"{bruto:.6f}", f"{fator:.4f}", f"{real:.6f}",
+                            f"{(previsto - real) / real:.4f}" if real > 0 else ""], cabecalho)
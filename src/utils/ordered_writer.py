@@ -0,0 +1,72 @@
+import hashlib
+import threading
+from pathlib import Path
+from .formatting import formatar_truncado
+
+class EscritorOrdenado:
+    # Grava o matC.txt a partir de blocos de linhas que podem chegar fora de ordem.
+    # Por padrão os valores são truncados para 4 casas (formatting.formatar_truncado).
+    # Só guarda em memória os blocos que chegaram antes da próxima linha esperada,
+    # escreve em pedaços grandes e calcula o SHA-256 enquanto escreve, sem
+    # precisar reler o arquivo no final. Pode ser usado por várias threads.
+    def __init__(self, caminho, total_linhas, formatar=formatar_truncado, tamanho_buffer=4 * 1024 * 1024):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.total_linhas = total_linhas
+        self.formatar = formatar
+        self.tamanho_buffer = tamanho_buffer
+        self.proxima_linha = 0
+        self.pendentes = {}
+        self.buffer = []
+        self.bytes_no_buffer = 0
+        self.sha = hashlib.sha256()
+        self.lock = threading.Lock()
+        self.arquivo = open(self.caminho, "wb")
+
+    def adicionar(self, inicio, bloco):
+        # Recebe as linhas inicio..inicio+len(bloco) de C
+        with self.lock:
+            if inicio < self.proxima_linha or inicio in self.pendentes:
+                raise ValueError(f"Bloco iniciado na linha {inicio} recebido em duplicidade.")
+            self.pendentes[inicio] = bloco
+            while self.proxima_linha in self.pendentes:
+                bloco = self.pendentes.pop(self.proxima_linha)
+                self._escrever(bloco)
+                self.proxima_linha += len(bloco)
+
+    def _escrever(self, bloco):
+        if len(bloco) == 0:
+            return
+        dados = self.formatar(bloco)
+        if isinstance(dados, str):
+            dados = dados.encode("utf8")
+        if self.proxima_linha > 0:
+            dados = b"\n" + dados
+        self.sha.update(dados)
+        self.buffer.append(dados)
+        self.bytes_no_buffer += len(dados)
+        if self.bytes_no_buffer >= self.tamanho_buffer:
+            self._descarregar()
+
+    def _descarregar(self):
+        self.arquivo.write(b"".join(self.buffer))
+        self.buffer = []
+        self.bytes_no_buffer = 0
+
+    def fechar(self):
+        # Grava o que restou e retorna o SHA-256 (hex) do arquivo completo
+        with self.lock:
+            if self.proxima_linha != self.total_linhas:
+                faltando = self.total_linhas - self.proxima_linha
+                self.arquivo.close()
+                raise RuntimeError(f"matC incompleta: faltam {faltando} linhas a partir da linha {self.proxima_linha}.")
+            self._descarregar()
+            self.arquivo.close()
+            return self.sha.hexdigest()
+
+def escrever_matriz(caminho, matriz, formatar=formatar_truncado, linhas_por_bloco=256):
+    # Grava uma matriz já completa em blocos de linhas e retorna o SHA-256 do arquivo
+    escritor = EscritorOrdenado(caminho, len(matriz), formatar)
+    for inicio in range(0, len(matriz), linhas_por_bloco):
+        escritor.adicionar(inicio, matriz[inicio:inicio + linhas_por_bloco])
+    return escritor.fechar()
@@ -0,0 +1,51 @@
+import numpy as np
+from .formatting import ESCALA, formatar_inteiros
+
+# Modo exato: as matrizes de entrada têm exatamente 4 casas decimais, então
+# A * 10^4 e B * 10^4 são inteiros. O produto em int64 (escala 10^8) é exato e não
+# depende da ordem das somas, e o truncamento para 4 casas é uma única divisão
+# inteira. O resultado (e o hash) é o mesmo em qualquer modo e divisão do trabalho.
+LIMITE_INT64 = int(np.iinfo(np.int64).max)
+
+def para_ponto_fixo(matriz, tolerancia=1e-6):
+    # Converte para int64 em escala 10^4; recusa valores com mais de 4 casas
+    m = np.asarray(matriz, dtype=np.float64)
+    escalada = m * ESCALA
+    inteiros = np.rint(escalada)
+    if m.size:
+        if np.abs(escalada - inteiros).max() > tolerancia:
+            raise ValueError("A matriz tem valores com mais de 4 casas decimais; "
+                             "o modo exato exige entradas com no máximo 4 casas.")
+        if np.abs(inteiros).max() > LIMITE_INT64:
+            raise OverflowError("Valor de entrada grande demais para int64 em escala 10^4.")
+    return inteiros.astype(np.int64)
+
+def _verificar_limite(num_elem, max_A, max_B):
+    # |C[i, j]| <= k * max|A| * max|B|; a conta é feita com inteiros Python
+    limite = num_elem * max_A * max_B
+    if limite > LIMITE_INT64:
+        raise OverflowError(f"O produto pode exceder int64 (limite estimado {limite:.3e}); "
+                            "use o modo em ponto flutuante para estas matrizes.")
+
+def verificar_overflow(A, B):
+    # Para matrizes já em ponto fixo (int64)
+    if A.size == 0 or B.size == 0:
+        return
+    _verificar_limite(A.shape[1], int(np.abs(A).max()), int(np.abs(B).max()))
+
+def verificar_overflow_entradas(matA, matB):
+    # Mesma verificação a partir das matrizes float originais, antes de convertê-las
+    if np.size(matA) == 0 or np.size(matB) == 0:
+        return
+    _verificar_limite(np.shape(matA)[1], int(np.rint(np.abs(matA).max() * ESCALA)),
+                      int(np.rint(np.abs(matB).max() * ESCALA)))
+
+def truncar_produto(C):
+    # C em escala 10^8 (produto de dois valores em escala 10^4) -> escala 10^4,
+    # truncando em direção a zero como int(valor * 10000)
+    C = np.asarray(C, dtype=np.int64)
+    return np.sign(C) * (np.abs(C) // ESCALA)
+
+def formatar_produto(bloco):
+    # Formatador do matC.txt para blocos de C exatos (EscritorOrdenado / escrever_matriz)
+    return formatar_inteiros(truncar_produto(bloco))
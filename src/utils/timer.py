@@ -1,5 +1,8 @@
 import time
 import csv
+import json
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 def agora_ts():
@@ -8,21 +11,109 @@ def agora_ts():
 
 class TemporizadorSimples:
     # Timer simples para medir tempo de relógio e CPU
-    def __init__(self):
+    # por_thread=True mede só a CPU da thread atual (útil com várias threads ativas)
+    def __init__(self, por_thread=False):
         self.tempo_inicial = None
         self.cpu_inicial = None
+        self._cpu = time.thread_time if por_thread else time.process_time
 
     def iniciar(self):
         # Inicia o temporizador
         self.tempo_inicial = time.time()
-        self.cpu_inicial = time.process_time()
+        self.cpu_inicial = self._cpu()
 
     def parar(self):
         # Para o temporizador e retorna (tempo_relogio, tempo_cpu)
         tempo_final = time.time()
-        cpu_final = time.process_time()
+        cpu_final = self._cpu()
         return (tempo_final - self.tempo_inicial, cpu_final - self.cpu_inicial)
 
+class Rastreador:
+    # Registra intervalos (spans) nomeados por fase, com início, duração de relógio
+    # e CPU da thread, e exporta a linha do tempo no formato Chrome trace
+    # (abrir em chrome://tracing ou ui.perfetto.dev) e um resumo por fase em CSV.
+    # Spans de outro processo (ex.: um backend) entram com incorporar().
+    def __init__(self, processo="cliente"):
+        self.processo = processo
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def intervalo(self, nome, /, **args):
+        # O dicionário retornado é preenchido com o span ao final do bloco
+        t = TemporizadorSimples(por_thread=True)
+        span = {}
+        t.iniciar()
+        try:
+            yield span
+        finally:
+            relogio, cpu = t.parar()
+            span.update(self.registrar(nome, t.tempo_inicial, relogio, cpu, **args))
+
+    def registrar(self, nome, inicio, duracao, cpu=0.0, /, **args):
+        span = {"nome": nome, "processo": self.processo,
+                "thread": threading.current_thread().name,
+                "inicio": inicio, "duracao": duracao, "cpu": cpu, "args": args}
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def incorporar(self, spans, deslocamento=0.0):
+        # Adiciona spans vindos de outro processo; `deslocamento` (s) converte o
+        # relógio dele para o relógio deste processo
+        with self._lock:
+            for span in spans:
+                self.spans.append(dict(span, inicio=span["inicio"] + deslocamento))
+
+    def total(self, nome, processo=None):
+        return sum(s["duracao"] for s in self.spans
+                   if s["nome"] == nome and (processo is None or s["processo"] == processo))
+
+    def exportar_chrome(self, caminho):
+        p = Path(caminho)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["inicio"])
+        t0 = spans[0]["inicio"] if spans else 0.0
+        pids, tids, eventos = {}, {}, []
+        for s in spans:
+            pid = pids.setdefault(s["processo"], len(pids) + 1)
+            tid = tids.setdefault((s["processo"], s["thread"]), len(tids) + 1)
+            eventos.append({"name": s["nome"], "cat": s["processo"], "ph": "X",
+                            "ts": (s["inicio"] - t0) * 1e6, "dur": s["duracao"] * 1e6,
+                            "pid": pid, "tid": tid, "args": dict(s["args"], cpu_s=s["cpu"])})
+        for processo, pid in pids.items():
+            eventos.append({"name": "process_name", "ph": "M", "pid": pid,
+                            "args": {"name": processo}})
+        for (processo, thread), tid in tids.items():
+            eventos.append({"name": "thread_name", "ph": "M", "pid": pids[processo], "tid": tid,
+                            "args": {"name": thread}})
+        with open(p, "w", encoding="utf8") as f:
+            json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f)
+
+    def resumo(self):
+        # Agrega por (processo, fase): quantidade, tempo total/médio/máximo e CPU
+        grupos = {}
+        with self._lock:
+            for s in self.spans:
+                g = grupos.setdefault((s["processo"], s["nome"]), [0, 0.0, 0.0, 0.0])
+                g[0] += 1
+                g[1] += s["duracao"]
+                g[2] = max(g[2], s["duracao"])
+                g[3] += s["cpu"]
+        return [{"processo": processo, "fase": nome, "quantidade": q, "total_s": tot,
+                 "media_s": tot / q, "max_s": mx, "cpu_s": cpu}
+                for (processo, nome), (q, tot, mx, cpu) in sorted(grupos.items())]
+
+    def exportar_resumo(self, caminho, timestamp=None):
+        # Acrescenta o resumo desta execução ao CSV (uma linha por processo e fase)
+        timestamp = timestamp or agora_ts()
+        cabecalho = ["timestamp", "processo", "fase", "quantidade", "total_s", "media_s", "max_s", "cpu_s"]
+        for r in self.resumo():
+            adicionar_log(caminho, [timestamp, r["processo"], r["fase"], r["quantidade"],
+                                    f"{r['total_s']:.6f}", f"{r['media_s']:.6f}",
+                                    f"{r['max_s']:.6f}", f"{r['cpu_s']:.6f}"], cabecalho)
+
 def adicionar_log(caminho_csv, linha, cabecalho=None):
     """
     Adiciona uma linha em arquivo CSV.
@@ -36,3 +127,8 @@ def adicionar_log(caminho_csv, linha, cabecalho=None):
         if escrever_cabecalho and cabecalho:
             escritor.writerow(cabecalho)
         escritor.writerow(linha)
+
+
+def formatar_notas(**campos):
+    # Monta a coluna "notas" do run_logs.csv como "chave=valor;chave=valor"
+    return ";".join(f"{chave}={valor}" for chave, valor in campos.items())
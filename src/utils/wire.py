@@ -0,0 +1,49 @@
+import base64
+import struct
+import numpy as np
+
+# Formato binário de matrizes trafegadas entre cliente e backends:
+#   MAGICO | len(dtype) | dtype (ex.: "<f8") | ndim | shape (uint64 cada) | dados brutos
+# Os dados são o buffer contíguo little-endian do ndarray, sem nenhum objeto
+# Python por elemento; do lado de quem recebe, np.frombuffer cria a matriz
+# apontando direto para os bytes recebidos.
+MAGICO = b"MTX1"
+
+def codificar_array(arr):
+    arr = np.asarray(arr)
+    dtype = arr.dtype.newbyteorder("<")
+    arr = np.ascontiguousarray(arr, dtype=dtype)
+    nome_dtype = dtype.str.encode()
+    cabecalho = (MAGICO
+                 + struct.pack("<B", len(nome_dtype)) + nome_dtype
+                 + struct.pack("<B", arr.ndim)
+                 + struct.pack(f"<{arr.ndim}Q", *arr.shape))
+    return cabecalho + arr.tobytes()
+
+def decodificar_array(dados):
+    dados = para_bytes(dados)
+    if dados[:4] != MAGICO:
+        raise ValueError("Buffer não está no formato de matriz esperado (MTX1).")
+    pos = 4
+    (tam_dtype,) = struct.unpack_from("<B", dados, pos)
+    pos += 1
+    dtype = np.dtype(bytes(dados[pos:pos + tam_dtype]).decode())
+    pos += tam_dtype
+    (ndim,) = struct.unpack_from("<B", dados, pos)
+    pos += 1
+    forma = struct.unpack_from(f"<{ndim}Q", dados, pos)
+    pos += 8 * ndim
+    return np.frombuffer(dados, dtype=dtype, offset=pos, count=int(np.prod(forma))).reshape(forma)
+
+def para_bytes(dados):
+    # Com o serializer marshal os bytes chegam intactos; com serpent/json o Pyro5
+    # entrega um dicionário em base64. Aceita os dois casos.
+    if isinstance(dados, (bytes, bytearray, memoryview)):
+        return dados
+    if isinstance(dados, dict):
+        if "data" in dados:
+            return base64.b64decode(dados["data"])
+        if "py/b64" in dados:
+            return base64.b64decode(dados["py/b64"])
+        raise TypeError(f"Dict inesperado: chaves={list(dados.keys())}")
+    raise TypeError(f"Esperado bytes, recebi: {type(dados)}")